@@ -6,12 +6,30 @@ Descripción: Dashboard interactivo para análisis de cartera de clientes y AUMs
 
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import streamlit as st
 from datetime import datetime
 import io
+import time
+
+from servidor import iniciar_precalentamiento, estado_precalentamiento
+from datos import (
+    cargar_datos, listar_dimensiones, version_datos, indexar_datos, comparar_motores_lectura,
+    seleccion_filtro, ordenar_filas, indexar_clientes, buscar_clientes, a_pesos, ARCHIVO_EXCEL, MESES_ESPAÑOL
+)
+from ingesta import iniciar_carga, estado_carga, datos_carga
+from reporte import pdf_disponible, clave_reporte, iniciar_reporte, estado_reporte, pdf_reporte
+from analitica import (
+    calcular_metricas, calcular_crecimiento,
+    agregar_por_segmento, agregar_temporal, agregar_top_asesores, clientes_unicos_por_año,
+    calcular_flujos, COMPONENTES_FLUJO,
+    precalcular_series, tabla_metricas_moviles, historia_promedio_movil, VENTANAS_MOVILES,
+    pronosticar_series, tabla_pronosticos, HORIZONTE_MAXIMO, Z_CONFIANZA,
+    calcular_concentracion, curva_pareto, PORCENTAJES_TOP,
+    detectar_anomalias, DIMENSIONES_ANOMALIAS, UMBRAL_Z,
+    resumen_jerarquia, clientes_rama, nodos_jerarquia, NIVELES_JERARQUIA, MAX_CLIENTES_RAMA,
+    comparar_selecciones, ETIQUETAS_COMPARACION, detalle_asesor,
+    tabla_clientes, historia_cliente
+)
 
 # ==================== CONFIGURACIÓN DE PÁGINA ====================
 st.set_page_config(
@@ -49,83 +67,343 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# ==================== FUNCIONES DE CARGA Y CACHÉ ====================
-@st.cache_data(show_spinner="Cargando datos... Por favor espera 🔄")
-def cargar_datos():
-    """Carga y consolida datos de todos los años con optimización de memoria"""
-    archivo_excel = 'DataExce.xlsx'
-    
-    try:
-        # Cargar todas las hojas de forma eficiente
-        años = ['Base 2017', 'Base 2018', 'Base 2019', 'Base 2020', 'Base 2021', 'Base 2022']
-        dataframes = []
-        
-        for año in años:
-            df_temp = pd.read_excel(
-                archivo_excel,
-                sheet_name=año,
-                dtype={
-                    'Doc. Identificación': 'str',
-                    'Numero  Identificación': 'str',
-                    'Año': 'int16',
-                    'Numero de Mes': 'int8',
-                    'AUM Fin de Mes': 'float32',
-                    'No.Clientes': 'int8'
-                }
-            )
-            dataframes.append(df_temp)
-        
-        # Consolidar datos
-        df_consolidado = pd.concat(dataframes, ignore_index=True)
-        
-        # Limpieza de datos
-        df_consolidado = df_consolidado.fillna(0)
-        
-        # Crear columnas derivadas útiles
-        df_consolidado['Fecha'] = pd.to_datetime(
-            df_consolidado['Año'].astype(str) + '-' + 
-            df_consolidado['Numero de Mes'].astype(str) + '-01'
+# ==================== CARGA DIFERIDA DE DEPENDENCIAS ====================
+def cargar_plotly():
+    """Importa Plotly al dibujar el primer gráfico, no al iniciar el script"""
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    return px, go, make_subplots
+
+def generar_csv(df, filas):
+    """CSV de la selección: las filas se copian del DataFrame base solo al exportar"""
+    df_exportar = df.iloc[filas]
+    return df_exportar.assign(**{'AUM Fin de Mes': a_pesos(df_exportar['AUM Fin de Mes'])}).to_csv(index=False).encode('utf-8')
+
+def generar_excel(df_datos, df_segmento, df_top_asesores):
+    """Genera el reporte Excel; openpyxl solo se importa cuando se solicita la exportación"""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df_datos.assign(**{'AUM Fin de Mes': a_pesos(df_datos['AUM Fin de Mes'])}).to_excel(
+            writer, sheet_name='Datos', index=False
         )
+        df_segmento.to_excel(writer, sheet_name='Por Segmento', index=False)
+        df_top_asesores.to_excel(writer, sheet_name='Top Asesores', index=False)
+    return buffer.getvalue()
+
+def armar_reporte(metricas, graficos, df_crecimiento, df_segmento, df_top_asesores, filtros):
+    """Contenido agregado del reporte PDF (montos ya en pesos): KPIs, gráficos de la vista y tablas"""
+    kpis = pd.DataFrame({
+        'Indicador': ['AUM Total', 'Total Clientes', 'Asesores Activos', 'AUM Promedio'],
+        'Valor': [
+            f"${a_pesos(metricas['total_aum'])/1e9:.2f}B",
+            f"{int(metricas['total_clientes']):,}",
+            f"{metricas['num_asesores']:,}",
+            f"${a_pesos(metricas['aum_promedio'])/1e6:.2f}M"
+        ]
+    })
+    tablas = [
+        ('Crecimiento Anual', df_crecimiento, {
+            'AUM Fin de Mes': '${:,.0f}', 'No.Clientes': '{:,.0f}',
+            'Crecimiento_AUM_%': '{:+.1f}%', 'Crecimiento_Clientes_%': '{:+.1f}%'
+        }),
+        ('Resumen por Segmento', df_segmento, {'AUM Fin de Mes': '${:,.0f}', 'No.Clientes': '{:,.0f}'}),
+        ('Top 10 Asesores', df_top_asesores, {'AUM Fin de Mes': '${:,.0f}', 'No.Clientes': '{:,.0f}'})
+    ]
+    return {'kpis': kpis, 'graficos': graficos, 'tablas': tablas, 'filtros': filtros}
+
+# ==================== CARGA DE ARCHIVOS PROPIOS ====================
+def panel_carga_archivos():
+    """Sidebar para cargar un Excel o CSV propio; devuelve la versión de datos activa de la sesión"""
+    with st.sidebar.expander("📤 Cargar datos propios"):
+        archivo = st.file_uploader(
+            "Excel o CSV con el mismo esquema:",
+            type=['xlsx', 'csv']
+        )
+        if archivo is not None:
+            # El archivo se copia y se hashea una sola vez por file_id, no en cada rerun
+            carga_previa = st.session_state.get('carga_archivo')
+            if carga_previa is not None and carga_previa[0] == archivo.file_id and estado_carga(carga_previa[1]):
+                version = carga_previa[1]
+            else:
+                version = iniciar_carga(archivo.name, archivo.getvalue())
+                st.session_state['carga_archivo'] = (archivo.file_id, version)
+            estado = estado_carga(version)
+            
+            # Solo esta sesión espera: el archivo se procesa en el pool de ingesta
+            if estado is not None and not estado['listo'] and not estado['error']:
+                barra = st.progress(estado['progreso'], text=estado['etapa'])
+                while estado is not None and not estado['listo'] and not estado['error']:
+                    time.sleep(0.5)
+                    estado = estado_carga(version)
+                    if estado is not None:
+                        barra.progress(estado['progreso'], text=estado['etapa'])
+            
+            if estado is None:
+                st.warning("La carga fue liberada de memoria; vuelve a subir el archivo")
+            elif estado['error']:
+                st.error(f"Archivo inválido: {estado['error']}")
+            elif st.session_state.get('fuente_datos') != version:
+                if st.button("✅ Usar estos datos"):
+                    st.session_state['fuente_datos'] = version
+                    st.rerun()
         
-        # Nombre del mes
-        meses_español = {
-            1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
-            5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-            9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-        }
-        df_consolidado['Mes_Nombre'] = df_consolidado['Numero de Mes'].map(meses_español)
-        
-        return df_consolidado
+        if st.session_state.get('fuente_datos'):
+            if st.button("↩️ Volver a datos base"):
+                del st.session_state['fuente_datos']
+                st.rerun()
     
-    except Exception as e:
-        st.error(f"Error al cargar datos: {str(e)}")
-        return None
+    return st.session_state.get('fuente_datos')
+
+# ==================== COMPARACIÓN DE SELECCIONES ====================
+def filtros_seleccion(etiqueta, indice, dimensiones):
+    """Filtros de una selección del modo comparación (dimensión vacía = todos los valores)"""
+    with st.sidebar.expander(f"Selección {etiqueta}", expanded=True):
+        return {
+            'años': st.multiselect("Año(s):", dimensiones['años'], default=dimensiones['años'], key=f'años_{etiqueta}'),
+            'meses': st.multiselect(
+                "Mes(es):", dimensiones['meses'], default=dimensiones['meses'],
+                format_func=lambda x: MESES_ESPAÑOL.get(x, str(x)), key=f'meses_{etiqueta}'
+            ),
+            'Segmento Mesa': st.multiselect("Segmento(s):", dimensiones['segmentos'], key=f'segmentos_{etiqueta}'),
+            'Mesa': st.multiselect("Mesa(s):", dimensiones['mesas'], key=f'mesas_{etiqueta}'),
+            'Asesor Comercial': st.multiselect(
+                "Asesor(es):", indice['dimensiones']['Asesor Comercial'][1].tolist(), key=f'asesores_{etiqueta}'
+            )
+        }
 
-@st.cache_data
-def calcular_metricas(df):
-    """Calcula métricas principales del negocio"""
-    metricas = {
-        'total_aum': df['AUM Fin de Mes'].sum(),
-        'total_clientes': df['No.Clientes'].sum(),
-        'num_asesores': df['Asesor Comercial'].nunique(),
-        'num_segmentos': df['Segmento Mesa'].nunique(),
-        'aum_promedio': df['AUM Fin de Mes'].mean(),
-        'aum_mediano': df['AUM Fin de Mes'].median()
+def mostrar_comparacion(indice, version, dimensiones):
+    """Vista de comparación A vs B: todos los agregados de ambas selecciones en una sola pasada"""
+    px, go, make_subplots = cargar_plotly()
+    
+    st.sidebar.header("🔀 Selecciones a Comparar")
+    filtro_a = filtros_seleccion('A', indice, dimensiones)
+    filtro_b = filtros_seleccion('B', indice, dimensiones)
+    comparacion = comparar_selecciones(indice, version, filtro_a, filtro_b)
+    
+    # ==================== KPIs ====================
+    st.markdown("---")
+    st.subheader("📈 KPIs: Selección B vs Selección A")
+    
+    # Montos en centavos (enteros exactos): se pasan a pesos solo para mostrar
+    kpis = comparacion['kpis'].copy()
+    filas_aum = ['AUM Total', 'AUM Promedio', 'AUM Mediano']
+    kpis[['A', 'B', 'Diferencia']] = kpis[['A', 'B', 'Diferencia']].astype('float64')
+    kpis.loc[filas_aum, ['A', 'B', 'Diferencia']] = a_pesos(kpis.loc[filas_aum, ['A', 'B', 'Diferencia']])
+    formatos = {
+        'AUM Total': lambda x: f"${x/1e9:.2f}B",
+        'Total Clientes': lambda x: f"{x:,.0f}",
+        'Asesores Activos': lambda x: f"{x:,.0f}",
+        'AUM Promedio': lambda x: f"${x/1e6:.2f}M"
     }
-    return metricas
+    for col, (kpi, formato) in zip(st.columns(len(formatos)), formatos.items()):
+        with col:
+            fila = kpis.loc[kpi]
+            st.metric(
+                label=kpi,
+                value=formato(fila['B']) if pd.notna(fila['B']) else '-',
+                delta=f"{fila['Diferencia %']:+.1f}% vs A" if pd.notna(fila['Diferencia %']) else None,
+                help=f"A: {formato(fila['A']) if pd.notna(fila['A']) else '-'}"
+            )
+    st.dataframe(
+        kpis.style.format({'A': '{:,.2f}', 'B': '{:,.2f}', 'Diferencia': '{:+,.2f}', 'Diferencia %': '{:+.1f}%'}, na_rep='-'),
+        use_container_width=True
+    )
+    
+    # ==================== POR SEGMENTO ====================
+    st.markdown("---")
+    st.subheader("🎯 Segmentos: A vs B")
+    
+    df_segmentos = comparacion['segmentos'].copy()
+    columnas_aum = [('AUM Fin de Mes', c) for c in ['A', 'B', 'Diferencia']]
+    df_segmentos[columnas_aum] = a_pesos(df_segmentos[columnas_aum])
+    fig_segmentos = go.Figure()
+    for etiqueta, color in zip(ETIQUETAS_COMPARACION, ['steelblue', 'orange']):
+        fig_segmentos.add_trace(go.Bar(
+            x=df_segmentos.index,
+            y=df_segmentos[('AUM Fin de Mes', etiqueta)],
+            name=f'Selección {etiqueta}',
+            marker_color=color
+        ))
+    fig_segmentos.update_layout(
+        title='AUM por Segmento',
+        barmode='group',
+        yaxis_title='AUM (Pesos)',
+        xaxis_tickangle=-45,
+        height=450
+    )
+    st.plotly_chart(fig_segmentos, use_container_width=True)
+    st.dataframe(
+        df_segmentos.style.format('{:,.0f}', na_rep='-').format(
+            '{:+.1f}%', subset=[c for c in df_segmentos.columns if c[1] == 'Diferencia %'], na_rep='-'
+        ),
+        use_container_width=True
+    )
+    
+    # ==================== TEMPORAL ====================
+    st.markdown("---")
+    st.subheader("📅 Evolución Mensual: A vs B")
+    
+    # Meses alineados por posición: el mes n de A frente al mes n de B
+    df_temporal = comparacion['temporal'].copy()
+    df_temporal[['A', 'B', 'Diferencia']] = a_pesos(df_temporal[['A', 'B', 'Diferencia']].astype('float64'))
+    fig_temporal = go.Figure()
+    for etiqueta, color in zip(ETIQUETAS_COMPARACION, ['steelblue', 'orange']):
+        fig_temporal.add_trace(go.Scatter(
+            x=df_temporal.index,
+            y=df_temporal[etiqueta],
+            customdata=df_temporal[f'Fecha {etiqueta}'].dt.strftime('%Y-%m'),
+            mode='lines+markers',
+            name=f'Selección {etiqueta}',
+            line_color=color,
+            hovertemplate='%{customdata}: $%{y:,.0f}'
+        ))
+    fig_temporal.update_layout(
+        title='Evolución Mensual de AUMs (meses alineados)',
+        xaxis_title='Mes de la selección',
+        yaxis_title='AUM (Pesos)',
+        hovermode='x unified',
+        height=450
+    )
+    st.plotly_chart(fig_temporal, use_container_width=True)
+    st.dataframe(
+        df_temporal.style.format({
+            'Fecha A': '{:%Y-%m}', 'Fecha B': '{:%Y-%m}',
+            'A': '${:,.0f}', 'B': '${:,.0f}', 'Diferencia': '${:+,.0f}', 'Diferencia %': '{:+.1f}%'
+        }, na_rep='-'),
+        use_container_width=True
+    )
+    
+    # ==================== TOP ASESORES ====================
+    st.markdown("---")
+    st.subheader("🏆 Top Asesores: A vs B")
+    
+    df_asesores = comparacion['asesores'].copy()
+    df_asesores[['A', 'B', 'Diferencia']] = a_pesos(df_asesores[['A', 'B', 'Diferencia']])
+    fig_asesores = go.Figure()
+    for etiqueta, color in zip(ETIQUETAS_COMPARACION, ['steelblue', 'orange']):
+        fig_asesores.add_trace(go.Bar(
+            y=df_asesores.index,
+            x=df_asesores[etiqueta],
+            name=f'Selección {etiqueta}',
+            orientation='h',
+            marker_color=color
+        ))
+    fig_asesores.update_layout(
+        title='AUM por Asesor (unión de los top 10 de cada selección)',
+        barmode='group',
+        xaxis_title='AUM (Pesos)',
+        yaxis={'autorange': 'reversed'},
+        height=600
+    )
+    st.plotly_chart(fig_asesores, use_container_width=True)
+    st.dataframe(
+        df_asesores.style.format({'A': '${:,.0f}', 'B': '${:,.0f}', 'Diferencia': '${:+,.0f}', 'Diferencia %': '{:+.1f}%'}, na_rep='-'),
+        use_container_width=True
+    )
 
-@st.cache_data
-def calcular_crecimiento(df):
-    """Calcula tasas de crecimiento año a año"""
-    df_anual = df.groupby('Año').agg({
-        'AUM Fin de Mes': 'sum',
-        'No.Clientes': 'sum'
-    }).reset_index()
-    
-    df_anual['Crecimiento_AUM_%'] = df_anual['AUM Fin de Mes'].pct_change() * 100
-    df_anual['Crecimiento_Clientes_%'] = df_anual['No.Clientes'].pct_change() * 100
-    
-    return df_anual
+# ==================== DETALLE POR ASESOR ====================
+def mostrar_asesor(indice, version):
+    """Vista de un asesor: se calcula solo con sus filas a partir del índice por asesor"""
+    px, go, make_subplots = cargar_plotly()
+    
+    asesores = indice['dimensiones']['Asesor Comercial'][1].tolist()
+    asesor = st.sidebar.selectbox("Selecciona un asesor:", asesores, key='asesor_detalle')
+    detalle = detalle_asesor(indice, version, asesor)
+    mensual = detalle['mensual'].assign(AUM=lambda d: a_pesos(d['AUM']))
+    cartera = detalle['clientes'].assign(**{'AUM Último Mes': lambda d: a_pesos(d['AUM Último Mes'])})
+    ultimo = mensual.iloc[-1]
+    
+    # ==================== KPIs ====================
+    st.markdown("---")
+    st.subheader(f"👤 {asesor}")
+    st.caption(f"{detalle['registros']:,} registros entre {mensual['Fecha'].iloc[0]:%m/%Y} y {ultimo['Fecha']:%m/%Y}")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("AUM Último Mes", f"${ultimo['AUM']/1e9:.2f}B", delta=f"{ultimo['Fecha']:%m/%Y}", delta_color="off")
+    with col2:
+        st.metric("Clientes Activos", f"{int(ultimo['Clientes']):,}")
+    with col3:
+        st.metric("Clientes Históricos", f"{len(cartera):,}")
+    with col4:
+        st.metric(
+            "Rotación Último Mes",
+            f"+{int(ultimo['Clientes Nuevos'])} / -{int(ultimo['Clientes Perdidos'])}",
+            delta="Nuevos / Perdidos", delta_color="off"
+        )
+    
+    # ==================== EVOLUCIÓN MENSUAL ====================
+    st.markdown("---")
+    st.subheader("📅 Evolución Mensual")
+    
+    fig_mensual = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_mensual.add_trace(
+        go.Scatter(x=mensual['Fecha'], y=mensual['AUM'], name='AUM', mode='lines+markers', line_color='steelblue'),
+        secondary_y=False
+    )
+    fig_mensual.add_trace(
+        go.Bar(x=mensual['Fecha'], y=mensual['Clientes'], name='Clientes', marker_color='lightgray', opacity=0.6),
+        secondary_y=True
+    )
+    fig_mensual.update_layout(hovermode='x unified', height=450)
+    fig_mensual.update_yaxes(title_text='AUM (Pesos)', secondary_y=False)
+    fig_mensual.update_yaxes(title_text='Clientes', secondary_y=True)
+    st.plotly_chart(fig_mensual, use_container_width=True)
+    
+    # ==================== MEZCLA POR SEGMENTO ====================
+    st.markdown("---")
+    st.subheader("🎯 Mezcla por Segmento")
+    
+    mezcla = detalle['segmentos'].assign(AUM=lambda d: a_pesos(d['AUM']))
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        fig_mezcla = px.area(mezcla, x='Fecha', y='AUM', color='Segmento Mesa', title='AUM por Segmento')
+        fig_mezcla.update_layout(height=450, yaxis_title='AUM (Pesos)')
+        st.plotly_chart(fig_mezcla, use_container_width=True)
+    with col2:
+        fig_pie = px.pie(
+            mezcla[mezcla['Fecha'] == ultimo['Fecha']],
+            values='AUM',
+            names='Segmento Mesa',
+            title=f"Último Mes ({ultimo['Fecha']:%m/%Y})",
+            hole=0.4
+        )
+        st.plotly_chart(fig_pie, use_container_width=True)
+    
+    # ==================== ROTACIÓN DE CLIENTES ====================
+    st.markdown("---")
+    st.subheader("🔄 Rotación de Clientes")
+    
+    fig_rotacion = go.Figure()
+    fig_rotacion.add_trace(go.Bar(x=mensual['Fecha'], y=mensual['Clientes Nuevos'], name='Nuevos', marker_color='green'))
+    fig_rotacion.add_trace(go.Bar(x=mensual['Fecha'], y=-mensual['Clientes Perdidos'], name='Perdidos', marker_color='red'))
+    fig_rotacion.update_layout(barmode='relative', hovermode='x unified', height=400, yaxis_title='Clientes')
+    st.plotly_chart(fig_rotacion, use_container_width=True)
+    
+    # ==================== CARTERA DE CLIENTES ====================
+    st.markdown("---")
+    st.subheader("📋 Cartera de Clientes")
+    
+    solo_activos = st.checkbox("Solo clientes activos en el último mes", value=True)
+    if solo_activos:
+        cartera = cartera[cartera['Activo']]
+    st.dataframe(
+        cartera.style.format({
+            'AUM Último Mes': '${:,.0f}',
+            'Primer Mes': '{:%m/%Y}',
+            'Último Mes': '{:%m/%Y}'
+        }),
+        use_container_width=True,
+        hide_index=True,
+        height=400
+    )
+    st.download_button(
+        label="📥 Descargar cartera (CSV)",
+        data=cartera.to_csv(index=False).encode('utf-8'),
+        file_name=f'cartera_{asesor.replace(" ", "_")}_{datetime.now().strftime("%Y%m%d")}.csv',
+        mime='text/csv'
+    )
 
 # ==================== FUNCIÓN PRINCIPAL ====================
 def main():
@@ -133,19 +411,55 @@ def main():
     st.title("📊 Dashboard Financiero - Análisis de AUMs")
     st.markdown("### Análisis Integral de Assets Under Management 2017-2022")
     
-    # Cargar datos
-    with st.spinner("Cargando datos del sistema..."):
-        df = cargar_datos()
+    # Precalentamiento en segundo plano (no hace nada si ya fue iniciado por servidor.py)
+    iniciar_precalentamiento()
+    estado = estado_precalentamiento()
+    if estado['listo']:
+        st.sidebar.success(f"🟢 Datos precalentados ({estado['duracion_s']:.1f} s)")
+    elif estado['error']:
+        st.sidebar.error(f"🔴 Precalentamiento fallido: {estado['error']}")
+    else:
+        st.sidebar.warning(f"🟡 Precalentando caché: {estado['etapa']}")
+    
+    # Fuente de datos: archivo cargado por el usuario o el archivo base
+    fuente = panel_carga_archivos()
+    df = datos_carga(fuente) if fuente else None
+    if df is not None:
+        version = fuente
+        st.sidebar.info(f"📂 Usando datos cargados: **{df.attrs['manifiesto']['carga']['archivo']}**")
+    else:
+        if fuente:
+            st.session_state.pop('fuente_datos', None)
+            st.sidebar.warning("Los datos cargados ya no están disponibles; se usan los datos base")
+            fuente = None
+        # Cargar datos
+        with st.spinner("Cargando datos del sistema..."):
+            version = version_datos()
+            df = cargar_datos(version)
     
     if df is None:
         st.error("No se pudieron cargar los datos. Verifica que el archivo 'DataExce.xlsx' esté en el directorio.")
         return
     
+    indice = indexar_datos(df, version)
+    busqueda = indexar_clientes(indice, version)
+    dimensiones = listar_dimensiones(df, version)
+    
+    # ==================== DETALLE POR ASESOR ====================
+    if st.sidebar.toggle("👤 Detalle por asesor"):
+        mostrar_asesor(indice, version)
+        return
+    
+    # ==================== MODO COMPARACIÓN ====================
+    if st.sidebar.toggle("🔀 Modo comparación"):
+        mostrar_comparacion(indice, version, dimensiones)
+        return
+    
     # ==================== SIDEBAR - FILTROS ====================
     st.sidebar.header("🎯 Filtros de Análisis")
     
     # Filtro de Año
-    años_disponibles = sorted(df['Año'].unique())
+    años_disponibles = dimensiones['años']
     año_seleccionado = st.sidebar.multiselect(
         "Selecciona Año(s):",
         options=años_disponibles,
@@ -153,16 +467,16 @@ def main():
     )
     
     # Filtro de Mes
-    meses_disponibles = sorted(df['Numero de Mes'].unique())
+    meses_disponibles = dimensiones['meses']
     mes_seleccionado = st.sidebar.multiselect(
         "Selecciona Mes(es):",
         options=meses_disponibles,
         default=meses_disponibles,
-        format_func=lambda x: df[df['Numero de Mes']==x]['Mes_Nombre'].iloc[0] if len(df[df['Numero de Mes']==x]) > 0 else str(x)
+        format_func=lambda x: MESES_ESPAÑOL.get(x, str(x))
     )
     
     # Filtro de Segmento
-    segmentos_disponibles = sorted(df['Segmento Mesa'].unique())
+    segmentos_disponibles = dimensiones['segmentos']
     segmento_seleccionado = st.sidebar.multiselect(
         "Selecciona Segmento(s):",
         options=segmentos_disponibles,
@@ -170,7 +484,7 @@ def main():
     )
     
     # Filtro de Mesa
-    mesas_disponibles = sorted(df['Mesa'].unique())
+    mesas_disponibles = dimensiones['mesas']
     mesa_seleccionada = st.sidebar.multiselect(
         "Selecciona Mesa(s):",
         options=mesas_disponibles,
@@ -178,40 +492,102 @@ def main():
     )
     
     # Filtro de Asesor (top 20 por AUM)
-    top_asesores = df.groupby('Asesor Comercial')['AUM Fin de Mes'].sum().nlargest(20).index.tolist()
+    top_asesores = dimensiones['top_asesores']
     asesor_seleccionado = st.sidebar.multiselect(
         "Selecciona Asesor(es) (Top 20):",
         options=top_asesores,
         default=[]
     )
     
-    # Aplicar filtros
-    df_filtrado = df[
-        (df['Año'].isin(año_seleccionado)) &
-        (df['Numero de Mes'].isin(mes_seleccionado)) &
-        (df['Segmento Mesa'].isin(segmento_seleccionado)) &
-        (df['Mesa'].isin(mesa_seleccionada))
-    ]
+    # Aplicar filtros: la selección son posiciones de filas sobre el DataFrame base (sin copias)
+    filtro = {
+        'años': año_seleccionado,
+        'meses': mes_seleccionado,
+        'Segmento Mesa': segmento_seleccionado,
+        'Mesa': mesa_seleccionada,
+        'Asesor Comercial': asesor_seleccionado
+    }
+    if segmento_seleccionado and mesa_seleccionada:
+        filas = seleccion_filtro(indice, version, filtro)
+    else:
+        # Sin segmentos o sin mesas seleccionados no hay registros
+        filas = np.array([], dtype=np.int64)
+        filtro = {'años': [], 'meses': []}
     
-    if asesor_seleccionado:
-        df_filtrado = df_filtrado[df_filtrado['Asesor Comercial'].isin(asesor_seleccionado)]
+    # Meses que cumplen los filtros de año y mes (referencia de las vistas mensuales)
+    fechas = indice['fechas']
+    periodos_validos = np.flatnonzero(fechas.year.isin(año_seleccionado) & fechas.month.isin(mes_seleccionado))
+    
+    # Identifica los datos y la combinación de filtros actual (exportaciones generadas bajo demanda)
+    clave_filtros = (
+        version, tuple(año_seleccionado), tuple(mes_seleccionado), tuple(segmento_seleccionado),
+        tuple(mesa_seleccionada), tuple(asesor_seleccionado)
+    )
     
     # Información de filtros aplicados
     st.sidebar.markdown("---")
-    st.sidebar.info(f"**Registros filtrados:** {len(df_filtrado):,} de {len(df):,}")
+    st.sidebar.info(f"**Registros filtrados:** {len(filas):,} de {len(df):,}")
+    
+    # Resumen de carga y comparación de motores de lectura
+    carga = df.attrs.get('manifiesto', {}).get('carga')
+    if carga:
+        with st.sidebar.expander("📦 Resumen de carga"):
+            st.markdown(
+                f"**Archivo:** {carga['archivo']}  \n"
+                f"**Motor:** {carga['motor']}  \n"
+                f"**Hojas / columnas:** {carga['hojas']} / {carga['columnas']}  \n"
+                f"**Filas:** {carga['filas']:,}  \n"
+                f"**Lectura:** {carga['lectura_s']:.2f} s (total {carga['total_s']:.2f} s)  \n"
+                f"**Memoria:** {carga['memoria_mb']:.1f} MB"
+            )
+            # Reglas de calidad evaluadas durante la carga
+            calidad = df.attrs['manifiesto'].get('calidad')
+            if calidad:
+                incumplidas = {regla: r for regla, r in calidad['reglas'].items() if r['filas']}
+                st.markdown(
+                    f"**Validación:** {calidad['validacion_s']:.2f} s "
+                    f"({calidad['validacion_s'] / max(carga['total_s'], 1e-9):.1%} de la carga)"
+                )
+                if not incumplidas:
+                    st.success("✅ Sin problemas de calidad")
+                else:
+                    st.warning(
+                        "⚠️ " + " · ".join(f"{regla}: {r['filas']:,}" for regla, r in incumplidas.items())
+                    )
+                    if calidad['filas_excluidas']:
+                        st.caption(f"{calidad['filas_excluidas']:,} filas con año, mes o número de clientes fuera de rango fueron excluidas")
+                    st.dataframe(
+                        pd.DataFrame([
+                            {'Regla': regla, **ejemplo}
+                            for regla, r in incumplidas.items() for ejemplo in r['ejemplos']
+                        ]),
+                        hide_index=True
+                    )
+                st.dataframe(
+                    pd.DataFrame.from_dict(calidad['columnas'], orient='index').style.format('{:,.0f}', na_rep='-')
+                )
+            # La comparación de motores aplica solo al archivo base
+            es_archivo_base = fuente is None
+            if es_archivo_base and (st.button("⏱️ Comparar motores") or st.session_state.get('comparar_motores')):
+                st.session_state['comparar_motores'] = True
+                df_motores = comparar_motores_lectura(ARCHIVO_EXCEL, version)
+                st.dataframe(
+                    df_motores.style.format({'Segundos': '{:.2f}', 'Filas': '{:,.0f}', 'Aceleración': '{:.1f}x'}, na_rep='-'),
+                    hide_index=True
+                )
     
     # ==================== KPIs PRINCIPALES ====================
     st.markdown("---")
     st.subheader("📈 Indicadores Clave de Desempeño (KPIs)")
     
-    metricas = calcular_metricas(df_filtrado)
+    metricas = calcular_metricas(indice, version, filtro)
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
             label="AUM Total",
-            value=f"${metricas['total_aum']/1e9:.2f}B",
+            value=f"${a_pesos(metricas['total_aum'])/1e9:.2f}B",
             delta="Billones de pesos"
         )
     
@@ -232,15 +608,21 @@ def main():
     with col4:
         st.metric(
             label="AUM Promedio",
-            value=f"${metricas['aum_promedio']/1e6:.2f}M",
+            value=f"${a_pesos(metricas['aum_promedio'])/1e6:.2f}M",
             delta="Millones"
         )
     
     # ==================== ANÁLISIS DE CRECIMIENTO ====================
+    px, go, make_subplots = cargar_plotly()
+    
+    # Versión estática de cada gráfico de la vista, en orden, para el reporte PDF
+    graficos_reporte = []
+    
     st.markdown("---")
     st.subheader("📊 Análisis de Crecimiento Anual")
     
-    df_crecimiento = calcular_crecimiento(df_filtrado)
+    df_crecimiento = calcular_crecimiento(indice, version, filtro)
+    df_crecimiento['AUM Fin de Mes'] = a_pesos(df_crecimiento['AUM Fin de Mes'])
     
     col1, col2 = st.columns(2)
     
@@ -264,6 +646,7 @@ def main():
             height=400
         )
         st.plotly_chart(fig_crecimiento_aum, use_container_width=True)
+        graficos_reporte.append(('barras', df_crecimiento[['Año', 'AUM Fin de Mes']], 'Evolución Anual de AUMs'))
     
     with col2:
         # Tasas de crecimiento
@@ -287,17 +670,16 @@ def main():
             height=400
         )
         st.plotly_chart(fig_tasas, use_container_width=True)
+        graficos_reporte.append((
+            'lineas', df_crecimiento[['Año', 'Crecimiento_AUM_%']].dropna(), 'Tasa de Crecimiento Anual (%)'
+        ))
     
     # ==================== ANÁLISIS POR SEGMENTO ====================
     st.markdown("---")
     st.subheader("🎯 Análisis por Segmento")
     
-    df_segmento = df_filtrado.groupby('Segmento Mesa').agg({
-        'AUM Fin de Mes': 'sum',
-        'No.Clientes': 'sum',
-        'Asesor Comercial': 'nunique'
-    }).reset_index()
-    df_segmento = df_segmento.sort_values('AUM Fin de Mes', ascending=False)
+    df_segmento = agregar_por_segmento(indice, version, filtro)
+    df_segmento['AUM Fin de Mes'] = a_pesos(df_segmento['AUM Fin de Mes'])
     
     col1, col2 = st.columns(2)
     
@@ -313,6 +695,9 @@ def main():
         )
         fig_pie.update_traces(textposition='inside', textinfo='percent+label')
         st.plotly_chart(fig_pie, use_container_width=True)
+        graficos_reporte.append((
+            'torta', df_segmento[['Segmento Mesa', 'AUM Fin de Mes']], 'Distribución de AUM por Segmento'
+        ))
     
     with col2:
         # Bar chart de clientes por segmento
@@ -328,16 +713,88 @@ def main():
         fig_bar_segmento.update_traces(texttemplate='%{text:,}', textposition='outside')
         fig_bar_segmento.update_layout(showlegend=False, xaxis_tickangle=-45)
         st.plotly_chart(fig_bar_segmento, use_container_width=True)
+        graficos_reporte.append(('barras', df_segmento[['Segmento Mesa', 'No.Clientes']], 'Número de Clientes por Segmento'))
+    
+    # ==================== JERARQUÍA DE AUM ====================
+    st.markdown("---")
+    st.subheader("🌳 Jerarquía de AUM: Segmento → Mesa → Asesor → Cliente")
+    
+    if len(periodos_validos) == 0:
+        st.info("No hay meses en la selección actual")
+    else:
+        # Solo se expande la rama abierta; los clientes se leen del índice por asesor al abrirlo
+        columnas = st.columns(len(NIVELES_JERARQUIA) + 1)
+        with columnas[0]:
+            periodo_jerarquia = st.selectbox(
+                "Mes:",
+                options=list(periodos_validos[::-1]),
+                format_func=lambda p: fechas[p].strftime('%Y-%m'),
+                key='mes_jerarquia'
+            )
+        resumen = resumen_jerarquia(indice, fechas[periodo_jerarquia], indice['firmas'][periodo_jerarquia])
+        
+        ruta, base = [], resumen
+        for columna, nivel in zip(columnas[1:], NIVELES_JERARQUIA):
+            with columna:
+                opciones = base.groupby(nivel)['AUM'].sum().sort_values(ascending=False).index.tolist()
+                valor = st.selectbox(f"{nivel}:", options=['(Ninguno)'] + opciones, key=f'jerarquia_{nivel}')
+            if valor == '(Ninguno)':
+                break
+            ruta.append(valor)
+            base = base[base[nivel] == valor]
+        
+        clientes = None
+        if len(ruta) == len(NIVELES_JERARQUIA):
+            clientes = clientes_rama(indice, version, fechas[periodo_jerarquia], *ruta)
+        nodos = nodos_jerarquia(resumen, ruta, clientes)
+        
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            fig_jerarquia = go.Figure(go.Sunburst(
+                ids=nodos['id'],
+                labels=nodos['etiqueta'],
+                parents=nodos['padre'],
+                values=a_pesos(nodos['AUM']),
+                branchvalues='total',
+                hovertemplate='<b>%{label}</b><br>AUM: $%{value:,.0f}<br>%{percentParent:.1%} del nivel superior<extra></extra>'
+            ))
+            fig_jerarquia.update_layout(
+                title=f"AUM {fechas[periodo_jerarquia]:%m/%Y}: " + (' → '.join(ruta) if ruta else 'Todos los segmentos'),
+                height=550,
+                margin={'t': 50, 'l': 0, 'r': 0, 'b': 0}
+            )
+            st.plotly_chart(fig_jerarquia, use_container_width=True)
+        
+        with col2:
+            # Hijos del último nodo abierto
+            hijos = nodos[nodos['padre'] == ('/' + '/'.join(ruta) if ruta else '')]
+            nombre_nivel = NIVELES_JERARQUIA[len(ruta)] if len(ruta) < len(NIVELES_JERARQUIA) else 'Cliente'
+            df_hijos = pd.DataFrame({
+                nombre_nivel: hijos['etiqueta'],
+                'AUM': a_pesos(hijos['AUM']),
+                'Participación %': hijos['AUM'] / hijos['AUM'].sum() * 100
+            })
+            # El sunburst no tiene equivalente estático legible: el PDF muestra la rama abierta en barras
+            graficos_reporte.append((
+                'barras_h', df_hijos[[nombre_nivel, 'AUM']].head(MAX_CLIENTES_RAMA // 2),
+                f"AUM {fechas[periodo_jerarquia]:%m/%Y}: " + (' → '.join(ruta) if ruta else 'Todos los segmentos')
+            ))
+            if clientes is not None and len(clientes) > MAX_CLIENTES_RAMA:
+                st.caption(f"{len(clientes):,} clientes en la rama; se grafican los {MAX_CLIENTES_RAMA} mayores")
+            st.dataframe(
+                df_hijos.style.format({'AUM': '${:,.0f}', 'Participación %': '{:.1f}%'}),
+                use_container_width=True,
+                hide_index=True,
+                height=500
+            )
     
     # ==================== ANÁLISIS TEMPORAL ====================
     st.markdown("---")
     st.subheader("📅 Tendencias Temporales")
     
     # Evolución mensual de AUM
-    df_temporal = df_filtrado.groupby(['Año', 'Numero de Mes', 'Fecha']).agg({
-        'AUM Fin de Mes': 'sum',
-        'No.Clientes': 'sum'
-    }).reset_index().sort_values('Fecha')
+    df_temporal = agregar_temporal(indice, version, filtro)
+    df_temporal['AUM Fin de Mes'] = a_pesos(df_temporal['AUM Fin de Mes'])
     
     fig_temporal = make_subplots(
         rows=2, cols=1,
@@ -382,15 +839,306 @@ def main():
     fig_temporal.update_layout(height=700, showlegend=True, hovermode='x unified')
     
     st.plotly_chart(fig_temporal, use_container_width=True)
+    graficos_reporte += [
+        ('lineas', df_temporal[['Fecha', 'AUM Fin de Mes']], 'Evolución Mensual de AUMs'),
+        ('lineas', df_temporal[['Fecha', 'No.Clientes']], 'Evolución Mensual de Clientes')
+    ]
+    
+    # ==================== DESCOMPOSICIÓN DE FLUJOS ====================
+    st.markdown("---")
+    st.subheader("💧 Descomposición Mensual de Flujos de AUM")
+    
+    dimension_flujo = st.radio(
+        "Descomponer por:",
+        options=['Asesor Comercial', 'Segmento Mesa'],
+        horizontal=True
+    )
+    df_flujos = calcular_flujos(indice, dimension_flujo)
+    
+    # Los flujos se calculan sobre toda la historia; aquí solo se filtra el resultado
+    seleccion_dimension = asesor_seleccionado if dimension_flujo == 'Asesor Comercial' else segmento_seleccionado
+    df_flujos = df_flujos[
+        (df_flujos['Fecha'].dt.year.isin(año_seleccionado)) &
+        (df_flujos['Fecha'].dt.month.isin(mes_seleccionado))
+    ]
+    if seleccion_dimension:
+        df_flujos = df_flujos[df_flujos[dimension_flujo].isin(seleccion_dimension)]
+    columnas_monto = ['AUM Inicial'] + COMPONENTES_FLUJO + ['AUM Final']
+    df_flujos = df_flujos.assign(**{c: a_pesos(df_flujos[c]) for c in columnas_monto})
+    
+    if df_flujos.empty:
+        st.info("No hay pares de meses consecutivos en la selección actual")
+    else:
+        fechas_flujo = sorted(df_flujos['Fecha'].unique())
+        fecha_flujo = st.select_slider(
+            "Mes a descomponer:",
+            options=fechas_flujo,
+            value=fechas_flujo[-1],
+            format_func=lambda x: pd.Timestamp(x).strftime('%Y-%m')
+        )
+        totales_mes = df_flujos[df_flujos['Fecha'] == fecha_flujo][
+            ['AUM Inicial'] + COMPONENTES_FLUJO + ['AUM Final']
+        ].sum()
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Cascada del mes seleccionado
+            fig_cascada = go.Figure(go.Waterfall(
+                x=['AUM Inicial'] + COMPONENTES_FLUJO + ['AUM Final'],
+                measure=['absolute'] + ['relative'] * len(COMPONENTES_FLUJO) + ['total'],
+                y=[totales_mes['AUM Inicial']] + [totales_mes[c] for c in COMPONENTES_FLUJO] + [0],
+                text=[f'${totales_mes[c]/1e9:.2f}B' for c in ['AUM Inicial'] + COMPONENTES_FLUJO + ['AUM Final']],
+                textposition='outside',
+                increasing=dict(marker_color='green'),
+                decreasing=dict(marker_color='red'),
+                totals=dict(marker_color='steelblue')
+            ))
+            fig_cascada.update_layout(
+                title=f"Flujo de AUM - {pd.Timestamp(fecha_flujo).strftime('%Y-%m')}",
+                yaxis_title='AUM (Pesos)',
+                showlegend=False,
+                height=450
+            )
+            st.plotly_chart(fig_cascada, use_container_width=True)
+            conceptos = ['AUM Inicial'] + COMPONENTES_FLUJO + ['AUM Final']
+            graficos_reporte.append((
+                'cascada', pd.DataFrame({'Concepto': conceptos, 'AUM': [totales_mes[c] for c in conceptos]}),
+                f"Flujo de AUM - {pd.Timestamp(fecha_flujo).strftime('%Y-%m')}"
+            ))
+        
+        with col2:
+            # Componentes del flujo mes a mes
+            df_componentes = df_flujos.groupby('Fecha')[COMPONENTES_FLUJO].sum().reset_index()
+            fig_componentes = go.Figure()
+            for componente, color in zip(COMPONENTES_FLUJO, ['green', 'red', 'lightgreen', 'salmon']):
+                fig_componentes.add_trace(go.Bar(
+                    x=df_componentes['Fecha'],
+                    y=df_componentes[componente],
+                    name=componente,
+                    marker_color=color
+                ))
+            fig_componentes.update_layout(
+                title='Componentes del Cambio Mensual de AUM',
+                barmode='relative',
+                xaxis_title='Fecha',
+                yaxis_title='AUM (Pesos)',
+                hovermode='x unified',
+                height=450
+            )
+            st.plotly_chart(fig_componentes, use_container_width=True)
+            graficos_reporte.append(('apiladas', df_componentes, 'Componentes del Cambio Mensual de AUM'))
+        
+        st.caption(
+            f"Un cliente que cambia de {dimension_flujo.lower()} cuenta como perdido en el origen "
+            "y como nuevo en el destino."
+        )
+        
+        df_flujos_mostrar = df_flujos.sort_values(['Fecha', 'AUM Final'], ascending=[False, False])
+        st.dataframe(df_flujos_mostrar, use_container_width=True, height=300)
+        st.download_button(
+            label="📥 Descargar flujos (CSV)",
+            data=df_flujos_mostrar.to_csv(index=False).encode('utf-8'),
+            file_name=f'flujos_aum_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+            mime='text/csv'
+        )
+    
+    # ==================== MÉTRICAS MÓVILES Y CAGR ====================
+    st.markdown("---")
+    st.subheader("📐 Promedios Móviles, Crecimiento y CAGR")
+    
+    series = precalcular_series(indice, indice['version'])
+    
+    if len(periodos_validos) == 0:
+        st.info("No hay meses en la selección actual")
+    else:
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            dimension_movil = st.selectbox(
+                "Dimensión:",
+                options=['Segmento Mesa', 'Mesa', 'Asesor Comercial']
+            )
+        with col2:
+            fin_movil = st.select_slider(
+                "Mes de referencia:",
+                options=list(periodos_validos),
+                value=periodos_validos[-1],
+                format_func=lambda p: fechas[p].strftime('%Y-%m')
+            )
+        
+        serie = series[dimension_movil]
+        años_cagr = sorted(año_seleccionado)
+        df_moviles = tabla_metricas_moviles(serie, fechas, fin_movil, años_cagr[0], años_cagr[-1])
+        
+        seleccion_movil = {
+            'Segmento Mesa': segmento_seleccionado,
+            'Mesa': mesa_seleccionada,
+            'Asesor Comercial': asesor_seleccionado
+        }[dimension_movil]
+        if seleccion_movil:
+            df_moviles = df_moviles[df_moviles.index.isin(seleccion_movil)]
+        df_moviles = df_moviles.sort_values('AUM Mes', ascending=False)
+        columnas_monto = ['AUM Mes'] + [f'Promedio {v}M' for v in VENTANAS_MOVILES]
+        df_moviles[columnas_monto] = a_pesos(df_moviles[columnas_monto])
+        
+        col1, col2 = st.columns([3, 2])
+        
+        with col1:
+            # Promedio móvil en el tiempo para las 10 series con mayor AUM
+            ventana_grafico = st.radio("Ventana:", VENTANAS_MOVILES, index=2, horizontal=True,
+                                       format_func=lambda v: f"{v} meses")
+            historia = a_pesos(historia_promedio_movil(serie, ventana_grafico))
+            posiciones = serie['valores'].get_indexer(df_moviles.index[:10])
+            fig_movil = go.Figure()
+            for posicion in posiciones:
+                fig_movil.add_trace(go.Scatter(
+                    x=fechas[:fin_movil + 1],
+                    y=historia[posicion, :fin_movil + 1],
+                    mode='lines',
+                    name=str(serie['valores'][posicion])
+                ))
+            fig_movil.update_layout(
+                title=f'Promedio Móvil {ventana_grafico} Meses de AUM',
+                xaxis_title='Fecha',
+                yaxis_title='AUM (Pesos)',
+                hovermode='x unified',
+                height=450
+            )
+            st.plotly_chart(fig_movil, use_container_width=True)
+            graficos_reporte.append((
+                'lineas',
+                pd.DataFrame({
+                    'Fecha': fechas[:fin_movil + 1],
+                    **{str(serie['valores'][p]): historia[p, :fin_movil + 1] for p in posiciones}
+                }),
+                f'Promedio Móvil {ventana_grafico} Meses de AUM'
+            ))
+        
+        with col2:
+            columna_cagr = df_moviles.columns[-1]
+            fig_cagr = px.bar(
+                df_moviles.head(10).reset_index(names=dimension_movil),
+                x=columna_cagr,
+                y=dimension_movil,
+                orientation='h',
+                title=columna_cagr.replace(' %', ' (%)'),
+                color=columna_cagr,
+                color_continuous_scale='RdYlGn'
+            )
+            fig_cagr.update_layout(height=500, showlegend=False)
+            st.plotly_chart(fig_cagr, use_container_width=True)
+            graficos_reporte.append((
+                'barras_h',
+                df_moviles.head(10).reset_index(names=dimension_movil)[[dimension_movil, columna_cagr]].dropna(),
+                columna_cagr.replace(' %', ' (%)')
+            ))
+        
+        st.dataframe(
+            df_moviles.style.format({
+                c: ('{:.1f}%' if c.endswith('%') else '${:,.0f}') for c in df_moviles.columns
+            }, na_rep='-'),
+            use_container_width=True,
+            height=300
+        )
+    
+    # ==================== PRONÓSTICOS ====================
+    st.markdown("---")
+    st.subheader("🔮 Pronóstico de AUM")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        dimension_pronostico = st.selectbox(
+            "Dimensión a pronosticar:",
+            options=['Segmento Mesa', 'Mesa', 'Asesor Comercial'],
+            key='dimension_pronostico'
+        )
+    with col2:
+        horizonte = st.slider("Horizonte (meses):", min_value=6, max_value=HORIZONTE_MAXIMO, value=HORIZONTE_MAXIMO)
+    with col3:
+        nivel_confianza = st.select_slider(
+            "Confianza:", options=list(Z_CONFIANZA), value=95, format_func=lambda n: f"{n}%"
+        )
+    
+    # Todas las series de la dimensión se ajustan en un solo lote, una vez por versión de datos
+    pronosticos = pronosticar_series(indice, version, dimension_pronostico)
+    mensual = series[dimension_pronostico]['mensual']
+    df_pronostico = tabla_pronosticos(pronosticos, mensual, horizonte, nivel_confianza)
+    
+    seleccion_pronostico = {
+        'Segmento Mesa': segmento_seleccionado,
+        'Mesa': mesa_seleccionada,
+        'Asesor Comercial': asesor_seleccionado
+    }[dimension_pronostico]
+    if seleccion_pronostico:
+        df_pronostico = df_pronostico[df_pronostico.index.isin(seleccion_pronostico)]
+    df_pronostico = df_pronostico.sort_values('AUM Último Mes', ascending=False)
+    columnas_monto = [c for c in df_pronostico.columns if c not in ('Meses Ajustados', 'Variación %')]
+    df_pronostico[columnas_monto] = a_pesos(df_pronostico[columnas_monto])
+    
+    if len(df_pronostico) > 0:
+        valor_pronostico = st.selectbox(f"{dimension_pronostico} a graficar:", options=df_pronostico.index.tolist())
+        posicion = pronosticos['valores'].get_loc(valor_pronostico)
+        fechas_futuras = pronosticos['fechas'][:horizonte]
+        z = Z_CONFIANZA[nivel_confianza]
+        centro = a_pesos(pronosticos['pronostico'][posicion, :horizonte])
+        margen = z * a_pesos(pronosticos['error'][posicion, :horizonte])
+        
+        fig_pronostico = go.Figure()
+        fig_pronostico.add_trace(go.Scatter(
+            x=fechas, y=a_pesos(mensual[posicion]), mode='lines', name='Histórico', line_color='steelblue'
+        ))
+        fig_pronostico.add_trace(go.Scatter(
+            x=fechas, y=a_pesos(pronosticos['ajustado'][posicion]), mode='lines', name='Ajuste',
+            line={'color': 'gray', 'dash': 'dot'}
+        ))
+        fig_pronostico.add_trace(go.Scatter(
+            x=fechas_futuras, y=centro + margen, mode='lines', line_width=0, showlegend=False, hoverinfo='skip'
+        ))
+        fig_pronostico.add_trace(go.Scatter(
+            x=fechas_futuras, y=np.maximum(centro - margen, 0), mode='lines', line_width=0,
+            fill='tonexty', fillcolor='rgba(255,165,0,0.25)', name=f'Banda {nivel_confianza}%'
+        ))
+        fig_pronostico.add_trace(go.Scatter(
+            x=fechas_futuras, y=centro, mode='lines+markers', name='Pronóstico', line_color='orange'
+        ))
+        fig_pronostico.update_layout(
+            title=f'Pronóstico de AUM a {horizonte} Meses: {valor_pronostico}',
+            xaxis_title='Fecha',
+            yaxis_title='AUM (Pesos)',
+            hovermode='x unified',
+            height=450
+        )
+        st.plotly_chart(fig_pronostico, use_container_width=True)
+        vacio = np.full(horizonte, np.nan)
+        graficos_reporte.append((
+            'pronostico',
+            pd.DataFrame({
+                'Fecha': fechas.append(pd.DatetimeIndex(fechas_futuras)),
+                'Histórico': np.concatenate((a_pesos(mensual[posicion]), vacio)),
+                'Ajuste': np.concatenate((a_pesos(pronosticos['ajustado'][posicion]), vacio)),
+                'Pronóstico': np.concatenate((np.full(len(fechas), np.nan), centro)),
+                'Inferior': np.concatenate((np.full(len(fechas), np.nan), np.maximum(centro - margen, 0))),
+                'Superior': np.concatenate((np.full(len(fechas), np.nan), centro + margen))
+            }),
+            f'Pronóstico de AUM a {horizonte} Meses: {valor_pronostico} (banda {nivel_confianza}%)'
+        ))
+    
+    st.caption("Tendencia lineal + estacionalidad anual ajustadas por mínimos cuadrados desde el primer mes con AUM de cada serie")
+    st.dataframe(
+        df_pronostico.style.format({
+            **{c: '${:,.0f}' for c in columnas_monto},
+            'Variación %': '{:+.1f}%'
+        }, na_rep='-'),
+        use_container_width=True,
+        height=300
+    )
     
     # ==================== TOP ASESORES ====================
     st.markdown("---")
     st.subheader("🏆 Top 10 Asesores por AUM")
     
-    df_top_asesores = df_filtrado.groupby('Asesor Comercial').agg({
-        'AUM Fin de Mes': 'sum',
-        'No.Clientes': 'sum'
-    }).reset_index().sort_values('AUM Fin de Mes', ascending=False).head(10)
+    df_top_asesores = agregar_top_asesores(indice, version, filtro)
+    df_top_asesores['AUM Fin de Mes'] = a_pesos(df_top_asesores['AUM Fin de Mes'])
     
     fig_top_asesores = px.bar(
         df_top_asesores,
@@ -408,21 +1156,169 @@ def main():
     )
     fig_top_asesores.update_layout(height=500, showlegend=False)
     st.plotly_chart(fig_top_asesores, use_container_width=True)
+    graficos_reporte.append((
+        'barras_h', df_top_asesores[['Asesor Comercial', 'AUM Fin de Mes']], 'Top 10 Asesores por AUM Gestionado'
+    ))
+    
+    # ==================== RIESGO DE CONCENTRACIÓN ====================
+    st.markdown("---")
+    st.subheader("⚠️ Riesgo de Concentración de AUM")
+    
+    if len(periodos_validos) == 0:
+        st.info("No hay meses en la selección actual")
+    else:
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            dimension_concentracion = st.selectbox(
+                "Concentración dentro de:",
+                options=['Asesor Comercial', 'Mesa', 'Segmento Mesa'],
+                key='dimension_concentracion'
+            )
+        with col2:
+            # El AUM es un saldo: la concentración se mide sobre un mes, no sobre la suma del periodo
+            periodo_concentracion = st.select_slider(
+                "Mes de corte:",
+                options=list(periodos_validos),
+                value=periodos_validos[-1],
+                format_func=lambda p: fechas[p].strftime('%Y-%m'),
+                key='mes_concentracion'
+            )
+        
+        concentracion = calcular_concentracion(
+            indice, dimension_concentracion,
+            fechas[periodo_concentracion], indice['firmas'][periodo_concentracion]
+        )
+        df_concentracion = concentracion['tabla']
+        seleccion_concentracion = {
+            'Segmento Mesa': segmento_seleccionado,
+            'Mesa': mesa_seleccionada,
+            'Asesor Comercial': asesor_seleccionado
+        }[dimension_concentracion]
+        if seleccion_concentracion:
+            df_concentracion = df_concentracion[df_concentracion.index.isin(seleccion_concentracion)]
+        df_concentracion = df_concentracion.sort_values('HHI', ascending=False)
+        df_concentracion = df_concentracion.assign(AUM=a_pesos(df_concentracion['AUM']))
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            df_hhi = df_concentracion.head(15).reset_index()
+            fig_hhi = px.bar(
+                df_hhi,
+                x='HHI',
+                y=dimension_concentracion,
+                orientation='h',
+                color='Concentración',
+                color_discrete_map={'Baja': 'green', 'Moderada': 'orange', 'Alta': 'red'},
+                title='Índice Herfindahl-Hirschman (HHI) por Cartera',
+                hover_data=['Clientes', f'Top {PORCENTAJES_TOP[-1]}% Clientes %']
+            )
+            fig_hhi.add_vline(x=1500, line_dash='dash', line_color='orange')
+            fig_hhi.add_vline(x=2500, line_dash='dash', line_color='red')
+            fig_hhi.update_layout(height=500, yaxis={'categoryorder': 'total ascending'})
+            st.plotly_chart(fig_hhi, use_container_width=True)
+            graficos_reporte.append((
+                'barras_h', df_hhi[[dimension_concentracion, 'HHI']], 'Índice Herfindahl-Hirschman (HHI) por Cartera'
+            ))
+        
+        with col2:
+            grupos_pareto = st.multiselect(
+                "Curvas de Pareto:",
+                options=df_concentracion.index.tolist(),
+                default=df_concentracion.index[:3].tolist(),
+                max_selections=8
+            )
+            curvas_pareto = []
+            fig_pareto = go.Figure()
+            fig_pareto.add_trace(go.Scatter(
+                x=[0, 100], y=[0, 100],
+                mode='lines',
+                name='Distribución uniforme',
+                line=dict(color='gray', dash='dash')
+            ))
+            for grupo in grupos_pareto:
+                x, y = curva_pareto(concentracion, grupo)
+                fig_pareto.add_trace(go.Scatter(x=x, y=y, mode='lines', name=str(grupo)))
+                curvas_pareto.append(pd.DataFrame({'Serie': str(grupo), '% de Clientes': x, '% Acumulado de AUM': y}))
+            fig_pareto.update_layout(
+                title='Curva de Pareto del AUM por Cliente',
+                xaxis_title='% de Clientes (de mayor a menor AUM)',
+                yaxis_title='% Acumulado de AUM',
+                height=420
+            )
+            st.plotly_chart(fig_pareto, use_container_width=True)
+            if curvas_pareto:
+                graficos_reporte.append((
+                    'pareto', pd.concat(curvas_pareto, ignore_index=True), 'Curva de Pareto del AUM por Cliente'
+                ))
+        
+        st.dataframe(
+            df_concentracion.style.format({
+                'AUM': '${:,.0f}',
+                'HHI': '{:,.0f}',
+                **{f'Top {p}% Clientes %': '{:.1f}%' for p in PORCENTAJES_TOP}
+            }),
+            use_container_width=True,
+            height=300
+        )
+    
+    # ==================== ALERTAS DE ANOMALÍAS ====================
+    st.markdown("---")
+    st.subheader("🚨 Alertas de Movimientos Inusuales")
+    
+    if len(periodos_validos) == 0:
+        st.info("No hay meses en la selección actual")
+    else:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            dimension_alertas = st.selectbox("Series a vigilar:", options=DIMENSIONES_ANOMALIAS, key='dimension_alertas')
+        with col2:
+            meses_alertas = st.select_slider("Meses a revisar:", options=[1, 3, 6, 12], value=3)
+        with col3:
+            umbral_alertas = st.slider("Umbral |z|:", min_value=UMBRAL_Z, max_value=10.0, value=3.5, step=0.5)
+        
+        # Cada mes se evalúa contra los 12 cambios previos de cada serie; los meses ya evaluados salen de caché
+        df_alertas = detectar_anomalias(indice, dimension_alertas, periodos_validos[-meses_alertas:])
+        df_alertas = df_alertas[df_alertas['Z'].abs() >= umbral_alertas]
+        seleccion_alertas = {'Mesa': mesa_seleccionada, 'Asesor Comercial': asesor_seleccionado}.get(dimension_alertas)
+        if seleccion_alertas:
+            df_alertas = df_alertas[df_alertas['Entidad'].isin(seleccion_alertas)]
+        
+        conteo_tipos = df_alertas['Tipo'].value_counts()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Alertas", f"{len(df_alertas):,}")
+        col2.metric("Caídas", f"{conteo_tipos.get('Caída', 0):,}")
+        col3.metric("Alzas", f"{conteo_tipos.get('Alza', 0):,}")
+        col4.metric("Salidas", f"{conteo_tipos.get('Salida', 0):,}")
+        
+        if len(df_alertas) == 0:
+            st.success("Sin movimientos inusuales en los meses revisados")
+        else:
+            columnas_monto = ['AUM Anterior', 'AUM Actual', 'Cambio', 'Cambio Típico']
+            df_alertas = df_alertas.assign(**{c: a_pesos(df_alertas[c]) for c in columnas_monto})
+            st.dataframe(
+                df_alertas.rename(columns={'Entidad': dimension_alertas}).style.format({
+                    'Fecha': '{:%Y-%m}',
+                    **{c: '${:,.0f}' for c in columnas_monto},
+                    'Cambio %': '{:+.1f}%',
+                    'Z': '{:+.1f}'
+                }, na_rep='-'),
+                use_container_width=True,
+                hide_index=True,
+                height=350
+            )
     
     # ==================== ANÁLISIS DE RETENCIÓN ====================
     st.markdown("---")
     st.subheader("🔄 Análisis de Retención de Clientes")
     
     # Análisis de retención año a año
-    años_completos = sorted(df_filtrado['Año'].unique())
-    if len(años_completos) >= 2:
+    df_retencion = clientes_unicos_por_año(indice, version, filtro)
+    if len(df_retencion) >= 2:
         col1, col2 = st.columns(2)
         
         with col1:
             # Clientes por año
-            df_retencion = df_filtrado.groupby('Año')['Numero  Identificación'].nunique().reset_index()
-            df_retencion.columns = ['Año', 'Clientes Únicos']
-            
             fig_retencion = px.line(
                 df_retencion,
                 x='Año',
@@ -433,6 +1329,7 @@ def main():
             )
             fig_retencion.update_traces(textposition='top center', line_color='purple')
             st.plotly_chart(fig_retencion, use_container_width=True)
+            graficos_reporte.append(('lineas', df_retencion[['Año', 'Clientes Únicos']], 'Clientes Únicos por Año'))
         
         with col2:
             # Tasa de retención
@@ -453,6 +1350,53 @@ def main():
                 showlegend=False
             )
             st.plotly_chart(fig_cambio, use_container_width=True)
+            graficos_reporte.append((
+                'barras', df_retencion[['Año', 'Cambio %']].dropna(), 'Cambio Anual en Base de Clientes (%)'
+            ))
+    
+    # ==================== BÚSQUEDA DE CLIENTES ====================
+    st.markdown("---")
+    st.subheader("🔎 Búsqueda de Clientes")
+    
+    # Búsqueda por prefijo de palabras en el índice de clientes (independiente de los filtros)
+    consulta = st.text_input(
+        "Nombre o número de identificación:",
+        placeholder="Ej: SOFIA LOPEZ o 1002"
+    )
+    if consulta:
+        encontrados = buscar_clientes(busqueda, consulta)
+        if len(encontrados) == 0:
+            st.info("No se encontraron clientes")
+        else:
+            df_clientes = tabla_clientes(indice, busqueda, encontrados)
+            df_clientes['AUM Último Mes'] = a_pesos(df_clientes['AUM Último Mes'])
+            st.caption(f"{len(encontrados)} cliente(s), de mayor a menor AUM reciente (máximo 50)")
+            st.dataframe(
+                df_clientes.style.format({'AUM Último Mes': '${:,.0f}', 'Último Mes': '{:%m/%Y}'}),
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            posicion = st.selectbox(
+                "Historia de AUM de:",
+                options=range(len(encontrados)),
+                format_func=lambda i: f"{df_clientes['Nombre Cliente'].iloc[i]} ({df_clientes['Identificación'].iloc[i]})"
+            )
+            historia = historia_cliente(indice, busqueda, encontrados[posicion])
+            historia['AUM'] = a_pesos(historia['AUM'])
+            fig_historia = px.bar(
+                historia,
+                x='Fecha',
+                y='AUM',
+                color='Asesor Comercial',
+                hover_data=['Segmento Mesa', 'Mesa'],
+                title=f"AUM Mensual de {df_clientes['Nombre Cliente'].iloc[posicion]}"
+            )
+            fig_historia.update_layout(height=400, yaxis_title='AUM (Pesos)')
+            st.plotly_chart(fig_historia, use_container_width=True)
+            graficos_reporte.append((
+                'lineas', historia[['Fecha', 'AUM']], f"AUM Mensual de {df_clientes['Nombre Cliente'].iloc[posicion]}"
+            ))
     
     # ==================== TABLA DE DATOS DETALLADA ====================
     st.markdown("---")
@@ -476,15 +1420,12 @@ def main():
     with col3:
         orden = st.radio("Orden:", ['Descendente', 'Ascendente'])
     
-    # Mostrar tabla
-    df_mostrar = df_filtrado.sort_values(
-        by=ordenar_por,
-        ascending=(orden == 'Ascendente')
-    ).head(num_registros)
+    # Mostrar tabla: se ordena sobre el índice y solo se copian las filas visibles
+    filas_visibles = ordenar_filas(indice, filas, ordenar_por, ascendente=(orden == 'Ascendente'), n=num_registros)
     
     # Formatear columnas numéricas
-    df_display = df_mostrar.copy()
-    df_display['AUM Fin de Mes'] = df_display['AUM Fin de Mes'].apply(lambda x: f'${x:,.0f}')
+    df_display = df.iloc[filas_visibles].copy()
+    df_display['AUM Fin de Mes'] = a_pesos(df_display['AUM Fin de Mes']).apply(lambda x: f'${x:,.0f}')
     
     st.dataframe(
         df_display[[
@@ -502,33 +1443,82 @@ def main():
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        # Exportar datos filtrados a CSV
-        csv = df_filtrado.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Descargar CSV",
-            data=csv,
-            file_name=f'datos_filtrados_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-            mime='text/csv'
-        )
+        # Exportar datos filtrados a CSV bajo demanda: las filas solo se copian al pulsar el botón
+        csv_generado = st.session_state.get('csv_exportado')
+        if csv_generado is None or csv_generado[0] != clave_filtros:
+            if st.button("📄 Preparar CSV"):
+                with st.spinner("Generando CSV..."):
+                    csv_generado = (clave_filtros, generar_csv(df, filas))
+                st.session_state['csv_exportado'] = csv_generado
+        
+        if csv_generado is not None and csv_generado[0] == clave_filtros:
+            st.download_button(
+                label="📥 Descargar CSV",
+                data=csv_generado[1],
+                file_name=f'datos_filtrados_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+                mime='text/csv'
+            )
     
     with col2:
-        # Exportar resumen a Excel
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df_filtrado.head(10000).to_excel(writer, sheet_name='Datos', index=False)
-            df_segmento.to_excel(writer, sheet_name='Por Segmento', index=False)
-            df_top_asesores.to_excel(writer, sheet_name='Top Asesores', index=False)
+        # Exportar resumen a Excel bajo demanda: se genera una vez por combinación de filtros
+        clave_excel = clave_filtros
+        excel_generado = st.session_state.get('excel_exportado')
+        if excel_generado is None or excel_generado[0] != clave_excel:
+            if st.button("📊 Preparar Excel"):
+                with st.spinner("Generando Excel..."):
+                    excel_generado = (clave_excel, generar_excel(df.iloc[filas[:10000]], df_segmento, df_top_asesores))
+                st.session_state['excel_exportado'] = excel_generado
         
-        st.download_button(
-            label="📥 Descargar Excel",
-            data=buffer.getvalue(),
-            file_name=f'reporte_completo_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
-            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        if excel_generado is not None and excel_generado[0] == clave_excel:
+            st.download_button(
+                label="📥 Descargar Excel",
+                data=excel_generado[1],
+                file_name=f'reporte_completo_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
     
     with col3:
-        # Generar reporte PDF (placeholder)
-        st.info("📄 Exportación a PDF disponible próximamente")
+        # Reporte PDF en el pool de reportes: la sesión no queda bloqueada mientras se genera
+        if not pdf_disponible():
+            st.info("📄 Instala reportlab y matplotlib para exportar a PDF")
+        else:
+            # El contenido se arma en cada rerun (los gráficos se dibujan en el trabajador) y su hash
+            # identifica el PDF: cambiar un filtro o un control de cualquier sección pide un reporte nuevo
+            descripcion_filtros = (
+                f"Años: {', '.join(map(str, año_seleccionado))} | Meses: {len(mes_seleccionado)} | "
+                f"Segmentos: {len(segmento_seleccionado)} | Mesas: {len(mesa_seleccionada)} | "
+                f"Asesores: {', '.join(asesor_seleccionado) or 'todos'}"
+            )
+            contenido = armar_reporte(
+                metricas, graficos_reporte, df_crecimiento, df_segmento,
+                df_top_asesores, descripcion_filtros
+            )
+            clave_pdf = clave_reporte(contenido)
+            reporte = st.session_state.get('reporte_pdf')
+            if reporte != clave_pdf:
+                if st.button("📄 Preparar PDF"):
+                    reporte = iniciar_reporte(contenido)
+                    st.session_state['reporte_pdf'] = reporte
+            
+            if reporte == clave_pdf:
+                # Sin esperas en el script: el estado se consulta de nuevo con "Actualizar estado"
+                estado_pdf = estado_reporte(reporte)
+                if estado_pdf is None:
+                    st.session_state.pop('reporte_pdf', None)
+                    st.warning("El reporte fue liberado de memoria; vuelve a prepararlo")
+                elif estado_pdf['error']:
+                    st.session_state.pop('reporte_pdf', None)
+                    st.error(f"No se pudo generar el PDF: {estado_pdf['error']}")
+                elif estado_pdf['listo']:
+                    st.download_button(
+                        label="📥 Descargar PDF",
+                        data=pdf_reporte(reporte),
+                        file_name=f'reporte_aum_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+                        mime='application/pdf'
+                    )
+                else:
+                    st.progress(estado_pdf['progreso'], text=f"Generando PDF: {estado_pdf['etapa']}")
+                    st.button("🔄 Actualizar estado")
     
     # ==================== FOOTER ====================
     st.markdown("---")
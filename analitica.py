@@ -0,0 +1,729 @@
+"""
+Motores de análisis del Dashboard Financiero
+Autor: Enrique Alvarino
+Descripción: Cálculos vectorizados sobre los índices enteros de datos.py
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from datos import filas_periodo, seleccion_filtro, filas_asesor, filas_cliente, sumar_exacto
+
+COMPONENTES_FLUJO = ['Nuevos', 'Perdidos', 'Crecimiento', 'Contracción']
+
+# ==================== AGREGADOS PRINCIPALES ====================
+# Operan sobre la selección de filas del filtro (posiciones en el DataFrame base), calculada
+# una vez por versión y filtro: solo se leen los arreglos del índice, nunca se copia el DataFrame filtrado
+def _por_grupo(_indice, filas, codigos, n_grupos):
+    """Registros, AUM (centavos) y clientes por grupo en una pasada sobre las filas seleccionadas"""
+    grupo = codigos[filas]
+    return (
+        np.bincount(grupo, minlength=n_grupos),
+        sumar_exacto(grupo, _indice['aum'][filas], n_grupos),
+        sumar_exacto(grupo, _indice['no_clientes'][filas], n_grupos)
+    )
+
+def _distintos_por_grupo(grupo, codigos, n_codigos, n_grupos):
+    """Cantidad de códigos distintos dentro de cada grupo"""
+    pares = np.unique(grupo.astype(np.int64) * n_codigos + codigos)
+    return np.bincount(pares // n_codigos, minlength=n_grupos)
+
+@st.cache_data(show_spinner=False)
+def calcular_metricas(_indice, version, filtro):
+    """Calcula métricas principales del negocio"""
+    filas = seleccion_filtro(_indice, version, filtro)
+    aum = _indice['aum'][filas]
+    metricas = {
+        'total_aum': int(aum.sum()),
+        'total_clientes': int(_indice['no_clientes'][filas].sum()),
+        'num_asesores': len(np.unique(_indice['dimensiones']['Asesor Comercial'][0][filas])),
+        'num_segmentos': len(np.unique(_indice['dimensiones']['Segmento Mesa'][0][filas])),
+        'aum_promedio': aum.mean() if len(aum) else np.nan,
+        'aum_mediano': np.median(aum) if len(aum) else np.nan
+    }
+    return metricas
+
+@st.cache_data(show_spinner=False)
+def calcular_crecimiento(_indice, version, filtro):
+    """Calcula tasas de crecimiento año a año"""
+    filas = seleccion_filtro(_indice, version, filtro)
+    años, grupo = np.unique(_indice['año'][filas], return_inverse=True)
+    df_anual = pd.DataFrame({
+        'Año': años,
+        'AUM Fin de Mes': sumar_exacto(grupo, _indice['aum'][filas], len(años)),
+        'No.Clientes': sumar_exacto(grupo, _indice['no_clientes'][filas], len(años))
+    })
+    
+    df_anual['Crecimiento_AUM_%'] = df_anual['AUM Fin de Mes'].pct_change() * 100
+    df_anual['Crecimiento_Clientes_%'] = df_anual['No.Clientes'].pct_change() * 100
+    
+    return df_anual
+
+@st.cache_data(show_spinner=False)
+def agregar_por_segmento(_indice, version, filtro):
+    """AUM, clientes y asesores por segmento, ordenado por AUM"""
+    filas = seleccion_filtro(_indice, version, filtro)
+    segmento, segmentos = _indice['dimensiones']['Segmento Mesa']
+    asesor, asesores = _indice['dimensiones']['Asesor Comercial']
+    registros, aum, clientes = _por_grupo(_indice, filas, segmento, len(segmentos))
+    df_segmento = pd.DataFrame({
+        'Segmento Mesa': segmentos,
+        'AUM Fin de Mes': aum,
+        'No.Clientes': clientes,
+        'Asesor Comercial': _distintos_por_grupo(segmento[filas], asesor[filas], len(asesores), len(segmentos))
+    })[registros > 0]
+    return df_segmento.sort_values('AUM Fin de Mes', ascending=False)
+
+@st.cache_data(show_spinner=False)
+def agregar_temporal(_indice, version, filtro):
+    """Evolución mensual de AUM y clientes"""
+    filas = seleccion_filtro(_indice, version, filtro)
+    registros, aum, clientes = _por_grupo(_indice, filas, _indice['periodo'], len(_indice['fechas']))
+    presentes = registros > 0
+    fechas = _indice['fechas'][presentes]
+    return pd.DataFrame({
+        'Año': fechas.year,
+        'Numero de Mes': fechas.month,
+        'Fecha': fechas,
+        'AUM Fin de Mes': aum[presentes],
+        'No.Clientes': clientes[presentes]
+    })
+
+@st.cache_data(show_spinner=False)
+def agregar_top_asesores(_indice, version, filtro, n=10):
+    """Top `n` asesores por AUM gestionado"""
+    filas = seleccion_filtro(_indice, version, filtro)
+    asesor, asesores = _indice['dimensiones']['Asesor Comercial']
+    registros, aum, clientes = _por_grupo(_indice, filas, asesor, len(asesores))
+    return pd.DataFrame({
+        'Asesor Comercial': asesores,
+        'AUM Fin de Mes': aum,
+        'No.Clientes': clientes
+    })[registros > 0].sort_values('AUM Fin de Mes', ascending=False).head(n)
+
+@st.cache_data(show_spinner=False)
+def clientes_unicos_por_año(_indice, version, filtro):
+    """Clientes únicos (por identificación) de cada año de la selección"""
+    filas = seleccion_filtro(_indice, version, filtro)
+    n_clientes = len(_indice['clientes'])
+    pares = np.unique(_indice['año'][filas].astype(np.int64) * n_clientes + _indice['cliente'][filas])
+    años, conteos = np.unique(pares // n_clientes, return_counts=True)
+    return pd.DataFrame({'Año': años, 'Clientes Únicos': conteos})
+
+# ==================== DESCOMPOSICIÓN DE FLUJOS ====================
+def _agregar_llaves(llaves, centavos):
+    """Suma exacta de centavos por llave; devuelve llaves únicas ordenadas y sus totales"""
+    unicas, inversa = np.unique(llaves, return_inverse=True)
+    return unicas, sumar_exacto(inversa, centavos, len(unicas))
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def _flujo_entre_meses(_indice, dimension, fecha_previa, fecha_actual, firma_previa, firma_actual):
+    """Descompone el cambio de AUM entre dos meses consecutivos por valor de la dimensión"""
+    periodo_previo = _indice['fechas'].get_loc(fecha_previa)
+    periodo_actual = _indice['fechas'].get_loc(fecha_actual)
+    codigos, valores = _indice['dimensiones'][dimension]
+    n_clientes = len(_indice['clientes'])
+    n_valores = len(valores)
+
+    # Llave compuesta (dimensión, cliente): un cliente que cambia de asesor
+    # cuenta como perdido para el anterior y nuevo para el actual
+    filas_a = filas_periodo(_indice, periodo_previo)
+    filas_b = filas_periodo(_indice, periodo_actual)
+    llaves_a, aum_a = _agregar_llaves(
+        codigos[filas_a].astype(np.int64) * n_clientes + _indice['cliente'][filas_a],
+        _indice['aum'][filas_a]
+    )
+    llaves_b, aum_b = _agregar_llaves(
+        codigos[filas_b].astype(np.int64) * n_clientes + _indice['cliente'][filas_b],
+        _indice['aum'][filas_b]
+    )
+
+    # Cruce por mezcla de arreglos ordenados
+    comunes, pos_a, pos_b = np.intersect1d(llaves_a, llaves_b, assume_unique=True, return_indices=True)
+    solo_a = np.ones(len(llaves_a), dtype=bool)
+    solo_a[pos_a] = False
+    solo_b = np.ones(len(llaves_b), dtype=bool)
+    solo_b[pos_b] = False
+    delta = aum_b[pos_b] - aum_a[pos_a]
+
+    grupo_a = llaves_a // n_clientes
+    grupo_b = llaves_b // n_clientes
+    grupo_comun = comunes // n_clientes
+
+    resultado = pd.DataFrame({
+        'Fecha': fecha_actual,
+        dimension: valores,
+        'AUM Inicial': sumar_exacto(grupo_a, aum_a, n_valores),
+        'Nuevos': sumar_exacto(grupo_b[solo_b], aum_b[solo_b], n_valores),
+        'Perdidos': -sumar_exacto(grupo_a[solo_a], aum_a[solo_a], n_valores),
+        'Crecimiento': sumar_exacto(grupo_comun, np.maximum(delta, 0), n_valores),
+        'Contracción': sumar_exacto(grupo_comun, np.minimum(delta, 0), n_valores),
+        'AUM Final': sumar_exacto(grupo_b, aum_b, n_valores),
+        'Clientes Nuevos': np.bincount(grupo_b[solo_b], minlength=n_valores),
+        'Clientes Perdidos': np.bincount(grupo_a[solo_a], minlength=n_valores)
+    })
+    activos = np.bincount(np.concatenate((grupo_a, grupo_b)), minlength=n_valores) > 0
+    return resultado[activos].reset_index(drop=True)
+
+def calcular_flujos(indice, dimension):
+    """Flujos mes a mes para toda la historia; solo recalcula los pares de meses nuevos o modificados"""
+    fechas = indice['fechas']
+    firmas = indice['firmas']
+    pares = [
+        _flujo_entre_meses(indice, dimension, fechas[p - 1], fechas[p], firmas[p - 1], firmas[p])
+        for p in range(1, len(fechas))
+    ]
+    if not pares:
+        return pd.DataFrame(columns=['Fecha', dimension, 'AUM Inicial'] + COMPONENTES_FLUJO + ['AUM Final'])
+    return pd.concat(pares, ignore_index=True)
+
+# ==================== SERIES ACUMULADAS ====================
+VENTANAS_MOVILES = [3, 6, 12]
+
+@st.cache_resource(show_spinner="Precalculando series por dimensión...", max_entries=4)
+def precalcular_series(_indice, version):
+    """Matrices valor × mes de AUM (centavos) y sus sumas acumuladas exactas por dimensión"""
+    n_meses = len(_indice['fechas'])
+    series = {}
+    for dimension, (codigos, valores) in _indice['dimensiones'].items():
+        llave = codigos.astype(np.int64) * n_meses + _indice['periodo']
+        mensual = sumar_exacto(llave, _indice['aum'], len(valores) * n_meses).reshape(len(valores), n_meses)
+        acumulado = np.zeros((len(valores), n_meses + 1), dtype=np.int64)
+        np.cumsum(mensual, axis=1, out=acumulado[:, 1:])
+        series[dimension] = {'valores': valores, 'mensual': mensual, 'acumulado': acumulado}
+    return series
+
+def _suma_ventana(acumulado, fin, ventana):
+    """Suma de los `ventana` meses que terminan en `fin` (incluido) para todas las series; O(1) por serie"""
+    inicio = fin + 1 - ventana
+    if inicio < 0:
+        return np.full(acumulado.shape[0], np.nan)
+    return acumulado[:, fin + 1] - acumulado[:, inicio]
+
+def promedio_movil(serie, fin, ventana):
+    """Promedio de los últimos `ventana` meses terminando en el periodo `fin`"""
+    return _suma_ventana(serie['acumulado'], fin, ventana) / ventana
+
+def crecimiento_movil(serie, fin, ventana):
+    """Crecimiento (%) del promedio móvil frente a la ventana inmediatamente anterior"""
+    actual = _suma_ventana(serie['acumulado'], fin, ventana)
+    previo = _suma_ventana(serie['acumulado'], fin - ventana, ventana) if fin >= ventana else np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (actual / previo - 1) * 100
+
+def cagr(serie, fechas, año_inicial, año_final):
+    """CAGR (%) entre el AUM mensual promedio del año inicial y el del año final"""
+    años = fechas.year
+    if año_final <= año_inicial or año_inicial not in años or año_final not in años:
+        return np.full(serie['acumulado'].shape[0], np.nan)
+
+    def promedio_año(año):
+        posiciones = np.flatnonzero(años == año)
+        return (
+            serie['acumulado'][:, posiciones[-1] + 1] - serie['acumulado'][:, posiciones[0]]
+        ) / len(posiciones)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        razon = promedio_año(año_final) / promedio_año(año_inicial)
+        return (np.power(razon, 1 / (año_final - año_inicial)) - 1) * 100
+
+def tabla_metricas_moviles(serie, fechas, fin, año_inicial, año_final):
+    """Tabla de AUM del mes, promedios y crecimientos móviles y CAGR para todas las series"""
+    tabla = pd.DataFrame({'AUM Mes': serie['mensual'][:, fin]}, index=serie['valores'])
+    for ventana in VENTANAS_MOVILES:
+        tabla[f'Promedio {ventana}M'] = promedio_movil(serie, fin, ventana)
+    for ventana in VENTANAS_MOVILES:
+        tabla[f'Crecimiento {ventana}M %'] = crecimiento_movil(serie, fin, ventana)
+    tabla[f'CAGR {año_inicial}-{año_final} %'] = cagr(serie, fechas, año_inicial, año_final)
+    return tabla
+
+def historia_promedio_movil(serie, ventana):
+    """Promedio móvil de todas las series para cada mes (NaN antes de completar la ventana)"""
+    acumulado = serie['acumulado']
+    historia = np.full(serie['mensual'].shape, np.nan)
+    historia[:, ventana - 1:] = (acumulado[:, ventana:] - acumulado[:, :-ventana]) / ventana
+    return historia
+
+# ==================== PRONÓSTICOS ====================
+HORIZONTE_MAXIMO = 12
+ARMONICOS = 2
+Z_CONFIANZA = {80: 1.2816, 90: 1.6449, 95: 1.9600}
+
+def _diseño_pronostico(meses_absolutos, origen):
+    """Matriz de regresores: nivel, tendencia (en años) y armónicos de la estacionalidad anual"""
+    t = (meses_absolutos - origen) / 12
+    columnas = [np.ones_like(t), t]
+    for k in range(1, ARMONICOS + 1):
+        angulo = 2 * np.pi * k * meses_absolutos / 12
+        columnas += [np.sin(angulo), np.cos(angulo)]
+    return np.column_stack(columnas)
+
+@st.cache_data(show_spinner="Ajustando pronósticos...")
+def pronosticar_series(_indice, version, dimension):
+    """Tendencia + estacionalidad por mínimos cuadrados para todas las series de la dimensión en un lote
+
+    Cada serie se ajusta desde su primer mes con AUM; los sistemas normales de todas las series
+    se resuelven juntos con np.linalg.solve sobre una pila de matrices p × p.
+    """
+    serie = precalcular_series(_indice, version)[dimension]
+    y = serie['mensual'].astype(np.float64)
+    fechas = _indice['fechas']
+    meses = (fechas.year.to_numpy() * 12 + fechas.month.to_numpy() - 1).astype(np.float64)
+    futuras = pd.date_range(fechas[-1] + pd.offsets.MonthBegin(1), periods=HORIZONTE_MAXIMO, freq='MS')
+    meses_futuros = meses[-1] + np.arange(1, HORIZONTE_MAXIMO + 1)
+
+    X = _diseño_pronostico(meses, meses[-1])
+    X_futuro = _diseño_pronostico(meses_futuros, meses[-1])
+    n_parametros = X.shape[1]
+
+    # Pesos 0/1: meses desde el primero con AUM de cada serie
+    activo = np.cumsum(y != 0, axis=1) > 0
+    pesos = activo.astype(np.float64)
+    observaciones = pesos.sum(axis=1)
+    suficientes = observaciones > n_parametros + 1
+
+    # Ecuaciones normales apiladas (series × p × p); las series sin datos suficientes usan la identidad
+    XtWX = np.einsum('tp,st,tq->spq', X, pesos, X)
+    XtWX[~suficientes] = np.eye(n_parametros)
+    XtWy = np.einsum('tp,st->sp', X, pesos * y)
+    coeficientes = np.linalg.solve(XtWX, XtWy[..., None])[..., 0]
+    inversa = np.linalg.inv(XtWX)
+
+    ajustado = coeficientes @ X.T
+    residuos = (y - ajustado) * pesos
+    with np.errstate(divide='ignore', invalid='ignore'):
+        varianza = (residuos ** 2).sum(axis=1) / (observaciones - n_parametros)
+
+    # Error de predicción: varianza residual más la incertidumbre de los coeficientes
+    apalancamiento = np.einsum('hp,spq,hq->sh', X_futuro, inversa, X_futuro)
+    pronostico = coeficientes @ X_futuro.T
+    error = np.sqrt(varianza[:, None] * (1 + apalancamiento))
+    pronostico[~suficientes] = np.nan
+    error[~suficientes] = np.nan
+
+    return {
+        'valores': serie['valores'],
+        'fechas': futuras,
+        'pronostico': pronostico,
+        'error': error,
+        'ajustado': np.where(activo, ajustado, np.nan),
+        'observaciones': observaciones.astype(np.int64)
+    }
+
+def tabla_pronosticos(pronosticos, mensual, horizonte, nivel=95):
+    """AUM del último mes, pronóstico a `horizonte` meses con banda de confianza y variación esperada"""
+    z = Z_CONFIANZA[nivel]
+    h = horizonte - 1
+    tabla = pd.DataFrame({
+        'AUM Último Mes': mensual[:, -1],
+        f'Pronóstico +{horizonte}M': pronosticos['pronostico'][:, h],
+        f'Inferior {nivel}%': np.maximum(pronosticos['pronostico'][:, h] - z * pronosticos['error'][:, h], 0),
+        f'Superior {nivel}%': pronosticos['pronostico'][:, h] + z * pronosticos['error'][:, h],
+        'Meses Ajustados': pronosticos['observaciones']
+    }, index=pronosticos['valores'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tabla['Variación %'] = np.where(
+            tabla['AUM Último Mes'] != 0,
+            (tabla[f'Pronóstico +{horizonte}M'] / tabla['AUM Último Mes'] - 1) * 100,
+            np.nan
+        )
+    return tabla
+
+# ==================== DETECCIÓN DE ANOMALÍAS ====================
+DIMENSIONES_ANOMALIAS = ['Asesor Comercial', 'Mesa', 'Cliente']
+VENTANA_ANOMALIAS = 12
+MESES_MINIMOS_ANOMALIAS = 6
+UMBRAL_Z = 3.0
+COLUMNAS_ANOMALIAS = ['Fecha', 'Entidad', 'AUM Anterior', 'AUM Actual', 'Cambio', 'Cambio %', 'Cambio Típico', 'Z', 'Tipo']
+
+def _etiquetas_entidad(_indice, dimension, codigos):
+    """Nombre de cada entidad; los clientes se muestran como 'Nombre (identificación)'"""
+    if dimension == 'Cliente':
+        return [f"{n} ({c})" for n, c in zip(_indice['nombres'][codigos], _indice['clientes'][codigos])]
+    return _indice['dimensiones'][dimension][1][codigos]
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def _anomalias_mes(_indice, dimension, fecha, firmas_ventana):
+    """Cambio mensual de AUM de cada serie con z-score robusto frente a sus propios cambios previos"""
+    periodo = _indice['fechas'].get_loc(fecha)
+    if periodo < 2:
+        # Sin al menos un cambio previo no hay historia contra la cual comparar
+        return pd.DataFrame(columns=COLUMNAS_ANOMALIAS)
+    periodos = range(max(0, periodo - VENTANA_ANOMALIAS - 1), periodo + 1)
+    if dimension == 'Cliente':
+        codigos, n_series = _indice['cliente'], len(_indice['clientes'])
+    else:
+        codigos, valores = _indice['dimensiones'][dimension]
+        n_series = len(valores)
+
+    # Matriz serie × mes de la ventana: solo se leen las filas de esos meses
+    matriz = np.column_stack([
+        sumar_exacto(codigos[filas], _indice['aum'][filas], n_series)
+        for filas in (filas_periodo(_indice, p) for p in periodos)
+    ])
+    activas = np.flatnonzero((matriz[:, -1] != 0) | (matriz[:, -2] != 0))
+    matriz = matriz[activas].astype(np.float64)
+
+    # z robusto: mediana y MAD de los cambios previos; piso del 1% del nivel típico de la serie
+    cambios = np.diff(matriz, axis=1)
+    historia, actual = cambios[:, :-1], cambios[:, -1]
+    mediana = np.median(historia, axis=1)
+    mad = np.median(np.abs(historia - mediana[:, None]), axis=1)
+    escala = np.maximum(1.4826 * mad, 0.01 * np.median(np.abs(matriz[:, :-1]), axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (actual - mediana) / escala
+    alerta = (
+        (escala > 0) & (np.abs(z) >= UMBRAL_Z) &
+        ((matriz[:, :-1] != 0).sum(axis=1) >= MESES_MINIMOS_ANOMALIAS)
+    )
+
+    previo, final = matriz[alerta, -2], matriz[alerta, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cambio_pct = np.where(previo != 0, (final / previo - 1) * 100, np.nan)
+    return pd.DataFrame({
+        'Fecha': fecha,
+        'Entidad': _etiquetas_entidad(_indice, dimension, activas[alerta]),
+        'AUM Anterior': previo.astype(np.int64),
+        'AUM Actual': final.astype(np.int64),
+        'Cambio': actual[alerta].astype(np.int64),
+        'Cambio %': cambio_pct,
+        'Cambio Típico': mediana[alerta],
+        'Z': z[alerta],
+        'Tipo': np.select([final == 0, actual[alerta] < 0], ['Salida', 'Caída'], default='Alza')
+    })
+
+def detectar_anomalias(indice, dimension, periodos):
+    """Alertas de los meses indicados; cada mes se cachea por las firmas de su ventana (incremental)"""
+    fechas, firmas = indice['fechas'], indice['firmas']
+    meses = [
+        _anomalias_mes(
+            indice, dimension, fechas[p],
+            tuple(firmas[max(0, p - VENTANA_ANOMALIAS - 1):p + 1])
+        )
+        for p in periodos
+    ]
+    alertas = pd.concat([m for m in meses if len(m)] or [pd.DataFrame(columns=COLUMNAS_ANOMALIAS)], ignore_index=True)
+    return alertas.reindex(alertas['Z'].abs().sort_values(ascending=False).index).reset_index(drop=True)
+
+# ==================== JERARQUÍA DE AUM ====================
+NIVELES_JERARQUIA = ['Segmento Mesa', 'Mesa', 'Asesor Comercial']
+MAX_CLIENTES_RAMA = 50
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def resumen_jerarquia(_indice, fecha, firma):
+    """AUM y clientes del mes por (segmento, mesa, asesor): los niveles superiores se agregan desde aquí"""
+    periodo = _indice['fechas'].get_loc(fecha)
+    filas = filas_periodo(_indice, periodo)
+
+    # Llave de base mixta con los códigos de los tres niveles
+    llave = np.zeros(len(filas), dtype=np.int64)
+    for nivel in NIVELES_JERARQUIA:
+        codigos, valores = _indice['dimensiones'][nivel]
+        llave = llave * len(valores) + codigos[filas]
+    llaves, aum = _agregar_llaves(llave, _indice['aum'][filas])
+    _, clientes = _agregar_llaves(llave, _indice['no_clientes'][filas])
+
+    resumen = pd.DataFrame({'AUM': aum, 'Clientes': clientes})
+    for nivel in reversed(NIVELES_JERARQUIA):
+        valores = _indice['dimensiones'][nivel][1]
+        resumen.insert(0, nivel, valores[llaves % len(valores)])
+        llaves = llaves // len(valores)
+    return resumen
+
+@st.cache_data(show_spinner=False)
+def clientes_rama(_indice, version, fecha, segmento, mesa, asesor):
+    """Clientes de una rama segmento/mesa/asesor en el mes; solo lee las filas del asesor"""
+    filas = filas_asesor(_indice, asesor)
+    # Las filas del asesor están en orden cronológico: el mes es un rango contiguo
+    periodo = _indice['fechas'].get_loc(fecha)
+    inicio, fin = np.searchsorted(_indice['periodo'][filas], [periodo, periodo + 1])
+    filas = filas[inicio:fin]
+    for nivel, valor in (('Segmento Mesa', segmento), ('Mesa', mesa)):
+        codigos, valores = _indice['dimensiones'][nivel]
+        filas = filas[codigos[filas] == valores.get_loc(valor)]
+
+    clientes, aum = _agregar_llaves(_indice['cliente'][filas], _indice['aum'][filas])
+    orden = np.argsort(-aum, kind='stable')
+    return pd.DataFrame({
+        'Identificación': _indice['clientes'][clientes[orden]],
+        'Nombre Cliente': _indice['nombres'][clientes[orden]],
+        'AUM': aum[orden]
+    })
+
+def nodos_jerarquia(resumen, ruta, clientes=None, max_clientes=MAX_CLIENTES_RAMA):
+    """Nodos (id, etiqueta, padre, AUM) de la rama abierta: hermanos de cada nivel de la ruta e hijos del último
+
+    `ruta` son los valores abiertos en orden (segmento, mesa, asesor); solo se expanden esos nodos.
+    """
+    nodos = []
+    padre, base = '', resumen
+    for profundidad, nivel in enumerate(NIVELES_JERARQUIA):
+        totales = base.groupby(nivel, sort=False)[['AUM', 'Clientes']].sum()
+        for valor, fila in totales.iterrows():
+            nodos.append({'id': f"{padre}/{valor}", 'etiqueta': valor, 'padre': padre, 'AUM': fila['AUM'], 'Clientes': fila['Clientes']})
+        if profundidad >= len(ruta):
+            break
+        base = base[base[nivel] == ruta[profundidad]]
+        padre = f"{padre}/{ruta[profundidad]}"
+
+    # Último nivel: los mayores clientes del asesor abierto y el resto agrupado
+    if clientes is not None and len(ruta) == len(NIVELES_JERARQUIA):
+        for _, fila in clientes.head(max_clientes).iterrows():
+            nodos.append({
+                'id': f"{padre}/{fila['Identificación']}", 'etiqueta': fila['Nombre Cliente'],
+                'padre': padre, 'AUM': fila['AUM'], 'Clientes': 1
+            })
+        if len(clientes) > max_clientes:
+            nodos.append({
+                'id': f"{padre}/otros", 'etiqueta': f"Otros {len(clientes) - max_clientes} clientes",
+                'padre': padre, 'AUM': clientes['AUM'].iloc[max_clientes:].sum(),
+                'Clientes': len(clientes) - max_clientes
+            })
+    return pd.DataFrame(nodos)
+
+# ==================== CONCENTRACIÓN DE RIESGO ====================
+PORCENTAJES_TOP = [1, 5, 10, 20]
+
+def clasificar_hhi(hhi):
+    """Nivel de concentración según umbrales HHI usuales (0-10.000)"""
+    return np.select([hhi < 1500, hhi < 2500], ['Baja', 'Moderada'], default='Alta')
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def calcular_concentracion(_indice, dimension, fecha, firma):
+    """Pareto, participación top x% y HHI del AUM de clientes dentro de cada valor de la dimensión"""
+    periodo = _indice['fechas'].get_loc(fecha)
+    codigos, valores = _indice['dimensiones'][dimension]
+    n_clientes = len(_indice['clientes'])
+
+    # AUM por (grupo, cliente) en el mes
+    filas = filas_periodo(_indice, periodo)
+    llaves, aum = _agregar_llaves(
+        codigos[filas].astype(np.int64) * n_clientes + _indice['cliente'][filas],
+        _indice['aum'][filas]
+    )
+    grupo = llaves // n_clientes
+
+    # Un solo ordenamiento: por grupo y, dentro del grupo, AUM descendente
+    orden = np.lexsort((-aum, grupo))
+    grupo, aum = grupo[orden], aum[orden]
+
+    n_por_grupo = np.bincount(grupo, minlength=len(valores))
+    total_por_grupo = sumar_exacto(grupo, aum, len(valores))
+    inicio_grupo = np.concatenate(([0], np.cumsum(n_por_grupo)))
+    rango = np.arange(len(grupo)) - inicio_grupo[grupo]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        participacion = np.where(total_por_grupo[grupo] != 0, aum / total_por_grupo[grupo], 0.0)
+
+    # Participación acumulada dentro de cada grupo a partir de una suma acumulada global
+    acumulada = np.cumsum(participacion)
+    base = np.concatenate(([0.0], acumulada))[inicio_grupo[:-1]]
+    acumulada -= base[grupo]
+
+    tabla = pd.DataFrame({
+        'Clientes': n_por_grupo,
+        'AUM': total_por_grupo,
+        'HHI': np.bincount(grupo, weights=participacion ** 2, minlength=len(valores)) * 10000
+    }, index=valores)
+    for porcentaje in PORCENTAJES_TOP:
+        k = np.ceil(n_por_grupo * porcentaje / 100)
+        en_top = rango < k[grupo]
+        tabla[f'Top {porcentaje}% Clientes %'] = np.bincount(
+            grupo[en_top], weights=participacion[en_top], minlength=len(valores)
+        ) * 100
+    tabla['Concentración'] = clasificar_hhi(tabla['HHI'].to_numpy())
+    tabla.index.name = dimension
+
+    activos = n_por_grupo > 0
+    return {
+        'tabla': tabla[activos],
+        'acumulada': acumulada,
+        'offsets': inicio_grupo,
+        'valores': valores
+    }
+
+def curva_pareto(concentracion, valor, puntos=200):
+    """Curva de Pareto de un grupo: % de clientes (de mayor a menor AUM) vs % acumulado de AUM"""
+    posicion = concentracion['valores'].get_loc(valor)
+    inicio, fin = concentracion['offsets'][posicion], concentracion['offsets'][posicion + 1]
+    acumulada = concentracion['acumulada'][inicio:fin]
+    if len(acumulada) == 0:
+        return np.array([0.0]), np.array([0.0])
+    muestra = np.unique(np.linspace(0, len(acumulada) - 1, min(puntos, len(acumulada))).astype(int))
+    x = np.concatenate(([0.0], (muestra + 1) / len(acumulada) * 100))
+    y = np.concatenate(([0.0], acumulada[muestra] * 100))
+    return x, y
+
+# ==================== COMPARACIÓN DE SELECCIONES ====================
+ETIQUETAS_COMPARACION = ['A', 'B']
+
+def _tabla_comparativa(valores_a, valores_b, indice_tabla):
+    """Columnas A, B, diferencia absoluta y porcentual; los totales en centavos siguen enteros"""
+    tabla = pd.DataFrame({'A': valores_a, 'B': valores_b}, index=indice_tabla)
+    tabla['Diferencia'] = tabla['B'] - tabla['A']
+    base = tabla['A'].astype('float64').to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tabla['Diferencia %'] = np.where(base != 0, tabla['Diferencia'].astype('float64').to_numpy() / base * 100, np.nan)
+    return tabla
+
+def _por_etiqueta(etiqueta, codigos, n_grupos, centavos=None):
+    """Agregación por (etiqueta, grupo) en una pasada; devuelve matriz 2 × n_grupos"""
+    llave = etiqueta * n_grupos + codigos
+    if centavos is None:
+        return np.bincount(llave, minlength=2 * n_grupos).reshape(2, n_grupos)
+    return sumar_exacto(llave, centavos, 2 * n_grupos).reshape(2, n_grupos)
+
+@st.cache_data(show_spinner="Comparando selecciones...")
+def comparar_selecciones(_indice, version, filtro_a, filtro_b, n_top=10):
+    """KPIs, segmentos, evolución mensual y top asesores de dos selecciones en una sola pasada"""
+    filas_a = seleccion_filtro(_indice, version, filtro_a)
+    filas_b = seleccion_filtro(_indice, version, filtro_b)
+
+    # Una sola lectura de columnas sobre ambas selecciones, etiquetadas 0 (A) y 1 (B)
+    filas = np.concatenate((filas_a, filas_b))
+    etiqueta = np.repeat(np.array([0, 1], dtype=np.int64), [len(filas_a), len(filas_b)])
+    aum = _indice['aum'][filas]
+    clientes = _indice['no_clientes'][filas]
+    segmento, segmentos = _indice['dimensiones']['Segmento Mesa']
+    asesor, asesores = _indice['dimensiones']['Asesor Comercial']
+    segmento, asesor, periodo = segmento[filas], asesor[filas], _indice['periodo'][filas]
+
+    registros = np.bincount(etiqueta, minlength=2)
+    aum_total = sumar_exacto(etiqueta, aum, 2)
+    clientes_total = sumar_exacto(etiqueta, clientes, 2)
+    asesor_presente = _por_etiqueta(etiqueta, asesor, len(asesores)) > 0
+    segmento_presente = _por_etiqueta(etiqueta, segmento, len(segmentos)) > 0
+    medianas = [np.median(aum[etiqueta == e]) if registros[e] else np.nan for e in (0, 1)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        promedios = np.where(registros > 0, aum_total / registros, np.nan)
+
+    # Columnas object: cada KPI conserva su tipo (totales enteros exactos, promedios float)
+    kpis = _tabla_comparativa(
+        np.array([aum_total[0], clientes_total[0], asesor_presente[0].sum(),
+                  segmento_presente[0].sum(), promedios[0], medianas[0], registros[0]], dtype=object),
+        np.array([aum_total[1], clientes_total[1], asesor_presente[1].sum(),
+                  segmento_presente[1].sum(), promedios[1], medianas[1], registros[1]], dtype=object),
+        ['AUM Total', 'Total Clientes', 'Asesores Activos', 'Segmentos',
+         'AUM Promedio', 'AUM Mediano', 'Registros']
+    )
+
+    # Por segmento
+    aum_segmento = _por_etiqueta(etiqueta, segmento, len(segmentos), aum)
+    clientes_segmento = _por_etiqueta(etiqueta, segmento, len(segmentos), clientes)
+    por_segmento = pd.concat({
+        'AUM Fin de Mes': _tabla_comparativa(aum_segmento[0], aum_segmento[1], segmentos),
+        'No.Clientes': _tabla_comparativa(clientes_segmento[0], clientes_segmento[1], segmentos)
+    }, axis=1)
+    por_segmento = por_segmento[segmento_presente.any(axis=0)]
+    por_segmento.index.name = 'Segmento Mesa'
+
+    # Evolución mensual alineada por posición del mes dentro de cada selección
+    # (p. ej. 2021 vs 2022: enero con enero); Int64 conserva los centavos exactos con meses faltantes
+    aum_mes = _por_etiqueta(etiqueta, periodo, len(_indice['fechas']), aum)
+    meses = [np.flatnonzero(presentes) for presentes in _por_etiqueta(etiqueta, periodo, len(_indice['fechas'])) > 0]
+    posiciones = pd.RangeIndex(1, max(len(m) for m in meses) + 1, name='Mes')
+    def alinear(valores):
+        return pd.Series(valores, index=posiciones[:len(valores)]).reindex(posiciones)
+    temporal = _tabla_comparativa(
+        alinear(aum_mes[0][meses[0]]).astype('Int64'), alinear(aum_mes[1][meses[1]]).astype('Int64'), posiciones
+    )
+    temporal.insert(0, 'Fecha A', alinear(_indice['fechas'][meses[0]]))
+    temporal.insert(1, 'Fecha B', alinear(_indice['fechas'][meses[1]]))
+
+    # Top asesores: unión de los top de cada selección
+    aum_asesor = _por_etiqueta(etiqueta, asesor, len(asesores), aum)
+    def mayores(valores):
+        orden = np.argsort(-valores)[:n_top]
+        return orden[valores[orden] > 0]
+    top = np.union1d(mayores(aum_asesor[0]), mayores(aum_asesor[1]))
+    por_asesor = _tabla_comparativa(aum_asesor[0][top], aum_asesor[1][top], asesores[top])
+    por_asesor.index.name = 'Asesor Comercial'
+    por_asesor = por_asesor.sort_values('B', ascending=False)
+
+    return {'kpis': kpis, 'segmentos': por_segmento, 'temporal': temporal, 'asesores': por_asesor}
+
+# ==================== DETALLE POR ASESOR ====================
+@st.cache_data(show_spinner=False)
+def detalle_asesor(_indice, version, asesor):
+    """Evolución mensual, cartera de clientes, mezcla por segmento y rotación de un asesor"""
+    filas = filas_asesor(_indice, asesor)
+    fechas = _indice['fechas']
+    periodo = _indice['periodo'][filas]
+    aum = _indice['aum'][filas]
+    segmento, segmentos = _indice['dimensiones']['Segmento Mesa']
+    segmento = segmento[filas]
+
+    # Meses de la historia del asesor (consecutivos, incluso si en alguno no tuvo registros)
+    primero, ultimo = periodo.min(), periodo.max()
+    n_meses = ultimo - primero + 1
+    mes = periodo - primero
+
+    # Presencia cliente × mes con códigos locales: tamaño proporcional a la cartera del asesor
+    clientes, local = np.unique(_indice['cliente'][filas], return_inverse=True)
+    presente = np.zeros((len(clientes), n_meses), dtype=bool)
+    presente[local, mes] = True
+    nuevos = np.zeros(n_meses, dtype=np.int64)
+    perdidos = np.zeros(n_meses, dtype=np.int64)
+    nuevos[1:] = (presente[:, 1:] & ~presente[:, :-1]).sum(axis=0)
+    perdidos[1:] = (~presente[:, 1:] & presente[:, :-1]).sum(axis=0)
+
+    mensual = pd.DataFrame({
+        'Fecha': fechas[primero:ultimo + 1],
+        'AUM': sumar_exacto(mes, aum, n_meses),
+        'Clientes': presente.sum(axis=0),
+        'Clientes Nuevos': nuevos,
+        'Clientes Perdidos': perdidos
+    })
+
+    # Mezcla por segmento mes a mes (solo segmentos en los que tuvo registros)
+    aum_segmento = sumar_exacto(
+        mes.astype(np.int64) * len(segmentos) + segmento, aum, n_meses * len(segmentos)
+    ).reshape(n_meses, len(segmentos))
+    con_registros = np.bincount(segmento, minlength=len(segmentos)) > 0
+    mezcla = pd.DataFrame(aum_segmento[:, con_registros], index=mensual['Fecha'], columns=segmentos[con_registros])
+    mezcla = mezcla.rename_axis(columns='Segmento Mesa').stack().rename('AUM').reset_index()
+
+    # Cartera: último mes con AUM, meses activos y segmento del último registro de cada cliente
+    ultimo_registro = np.zeros(len(clientes), dtype=np.int64)
+    ultimo_registro[local] = np.arange(len(local))
+    en_ultimo_mes = mes == n_meses - 1
+    primer_mes = presente.argmax(axis=1)
+    ultimo_mes = n_meses - 1 - presente[:, ::-1].argmax(axis=1)
+    cartera = pd.DataFrame({
+        'Identificación': _indice['clientes'][clientes],
+        'Nombre Cliente': _indice['nombres'][clientes],
+        'Segmento Mesa': segmentos[segmento[ultimo_registro]],
+        'AUM Último Mes': sumar_exacto(local[en_ultimo_mes], aum[en_ultimo_mes], len(clientes)),
+        'Meses Activos': presente.sum(axis=1),
+        'Primer Mes': fechas[primero + primer_mes],
+        'Último Mes': fechas[primero + ultimo_mes],
+        'Activo': presente[:, -1]
+    }).sort_values(['Activo', 'AUM Último Mes'], ascending=False, ignore_index=True)
+
+    return {'mensual': mensual, 'segmentos': mezcla, 'clientes': cartera, 'registros': len(filas)}
+
+# ==================== BÚSQUEDA DE CLIENTES ====================
+def tabla_clientes(indice, busqueda, clientes):
+    """Identificación, nombre y último estado (mes, asesor, segmento, AUM) de los clientes dados"""
+    ultima_fila = busqueda['ultima_fila'][clientes]
+    asesor, asesores = indice['dimensiones']['Asesor Comercial']
+    segmento, segmentos = indice['dimensiones']['Segmento Mesa']
+    return pd.DataFrame({
+        'Identificación': indice['clientes'][clientes],
+        'Nombre Cliente': indice['nombres'][clientes],
+        'Asesor Comercial': asesores[asesor[ultima_fila]],
+        'Segmento Mesa': segmentos[segmento[ultima_fila]],
+        'Último Mes': indice['fechas'][indice['periodo'][ultima_fila]],
+        'AUM Último Mes': busqueda['aum_reciente'][clientes]
+    })
+
+def historia_cliente(indice, busqueda, cliente):
+    """Registros mensuales de un cliente (fecha, asesor, segmento, mesa y AUM en centavos)"""
+    filas = filas_cliente(busqueda, cliente)
+    historia = pd.DataFrame({'Fecha': indice['fechas'][indice['periodo'][filas]]})
+    for dimension in ['Asesor Comercial', 'Segmento Mesa', 'Mesa']:
+        codigos, valores = indice['dimensiones'][dimension]
+        historia[dimension] = valores[codigos[filas]]
+    historia['AUM'] = indice['aum'][filas]
+    return historia
@@ -0,0 +1,97 @@
+"""
+Benchmark de arranque en frío del Dashboard
+Mide, en procesos nuevos, el tiempo de importación del script y el primer pintado
+
+Uso:
+    python benchmark_arranque.py [--repeticiones 5] [--script Dashboard.py]
+
+Para comparar contra una versión anterior, extrae el script de esa versión
+junto a los demás módulos y pásalo con --script.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+MODULOS_PESADOS = ['plotly.express', 'plotly.subplots', 'openpyxl', 'python_calamine', 'matplotlib', 'reportlab']
+
+# Importa el script como módulo (sin ejecutar main) y reporta qué dependencias quedaron cargadas
+CODIGO_IMPORTACION = r'''
+import sys, time, json, importlib.util
+inicio = time.perf_counter()
+spec = importlib.util.spec_from_file_location('tablero', sys.argv[1])
+modulo = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(modulo)
+print(json.dumps({
+    'importacion_s': time.perf_counter() - inicio,
+    'cargados': [m for m in sys.argv[2].split(',') if m in sys.modules]
+}))
+'''
+
+# Ejecuta una sesión completa con AppTest y marca el primer KPI y el primer gráfico
+CODIGO_PRIMER_PINTADO = r'''
+import sys, time, json
+inicio = time.perf_counter()
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+marcas = {}
+def marcar(nombre, funcion):
+    def envoltura(*args, **kwargs):
+        marcas.setdefault(nombre, time.perf_counter() - inicio)
+        return funcion(*args, **kwargs)
+    return envoltura
+
+st.metric = marcar('primer_kpi_s', st.metric)
+st.plotly_chart = marcar('primer_grafico_s', st.plotly_chart)
+
+AppTest.from_file(sys.argv[1], default_timeout=600).run()
+marcas['sesion_completa_s'] = time.perf_counter() - inicio
+print(json.dumps(marcas))
+'''
+
+def ejecutar(codigo, *argumentos):
+    """Ejecuta `codigo` en un intérprete nuevo y devuelve su última línea como JSON"""
+    salida = subprocess.run(
+        [sys.executable, '-c', codigo, *argumentos],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(argumentos[0]))
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+def resumir(mediciones, llave):
+    valores = [m[llave] for m in mediciones if llave in m]
+    if not valores:
+        return '-'
+    return f"{statistics.median(valores):.3f} s (mín {min(valores):.3f}, máx {max(valores):.3f})"
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--script', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Dashboard.py'))
+    args = parser.parse_args()
+    script = os.path.abspath(args.script)
+
+    print("=" * 60)
+    print("  BENCHMARK DE ARRANQUE EN FRÍO")
+    print("=" * 60)
+    print(f"  Script: {script}")
+    print(f"  Repeticiones: {args.repeticiones}")
+    print()
+
+    importaciones = [ejecutar(CODIGO_IMPORTACION, script, ','.join(MODULOS_PESADOS)) for _ in range(args.repeticiones)]
+    print(f"  Importación del script:  {resumir(importaciones, 'importacion_s')}")
+    print(f"  Dependencias cargadas:   {', '.join(importaciones[-1]['cargados']) or 'ninguna pesada'}")
+
+    sesiones = [ejecutar(CODIGO_PRIMER_PINTADO, script) for _ in range(args.repeticiones)]
+    print(f"  Primer KPI pintado:      {resumir(sesiones, 'primer_kpi_s')}")
+    print(f"  Primer gráfico:          {resumir(sesiones, 'primer_grafico_s')}")
+    print(f"  Sesión completa:         {resumir(sesiones, 'sesion_completa_s')}")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark de almacenamiento del AUM
+Compara la columna 'AUM Fin de Mes' en float32 contra centavos int64:
+memoria, tiempo de agregación por grupo y deriva de precisión
+
+Uso:
+    python benchmark_aum.py [--filas 5000000] [--grupos 44] [--repeticiones 5]
+"""
+
+import time
+import argparse
+import statistics
+
+import numpy as np
+import pandas as pd
+
+from datos import a_centavos, a_pesos, sumar_exacto
+
+def medir(funcion, repeticiones):
+    """Mediana de segundos de `funcion` y su último resultado"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), resultado
+
+def generar_datos(filas, grupos, semilla=42):
+    """AUM sintético en centavos (distribución log-normal, como los saldos reales) y grupo por fila"""
+    rng = np.random.default_rng(semilla)
+    pesos = np.round(rng.lognormal(mean=17, sigma=1.5, size=filas), 2)
+    return a_centavos(pesos), rng.integers(0, grupos, size=filas)
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--filas', type=int, default=5_000_000)
+    parser.add_argument('--grupos', type=int, default=44)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    centavos, grupos = generar_datos(args.filas, args.grupos)
+    flotante = a_pesos(centavos).astype(np.float32)
+
+    # Referencia exacta: suma entera en Python por grupo
+    exacto = pd.Series(centavos).groupby(grupos).sum().to_numpy()
+
+    print("=" * 60)
+    print("  BENCHMARK DE AUM: FLOAT32 VS CENTAVOS INT64")
+    print("=" * 60)
+    print(f"  Filas: {args.filas:,}   Grupos: {args.grupos}")
+    print()
+    print(f"  Memoria float32:         {flotante.nbytes / 1024**2:,.1f} MB")
+    print(f"  Memoria int64:           {centavos.nbytes / 1024**2:,.1f} MB")
+    print()
+
+    serie_flotante = pd.Series(flotante)
+    serie_centavos = pd.Series(centavos)
+    pruebas = [
+        ('groupby float32', lambda: serie_flotante.groupby(grupos).sum().to_numpy()),
+        ('groupby int64', lambda: serie_centavos.groupby(grupos).sum().to_numpy()),
+        ('bincount float32', lambda: np.bincount(grupos, weights=flotante, minlength=args.grupos)),
+        ('sumar_exacto int64', lambda: sumar_exacto(grupos, centavos, args.grupos))
+    ]
+    for nombre, funcion in pruebas:
+        segundos, resultado = medir(funcion, args.repeticiones)
+        if np.issubdtype(np.asarray(resultado).dtype, np.integer):
+            deriva = np.abs(resultado - exacto).max() / 100
+        else:
+            deriva = np.abs(np.asarray(resultado, dtype=np.float64) * 100 - exacto).max() / 100
+        print(f"  {nombre:<20} {segundos * 1000:8.1f} ms   deriva máx. ${deriva:,.2f}")
+
+    total_float32 = float(flotante.sum(dtype=np.float32))
+    print()
+    print(f"  Total exacto:            ${a_pesos(int(exacto.sum())):,.2f}")
+    print(f"  Total float32:           ${total_float32:,.2f}")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
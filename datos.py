@@ -0,0 +1,477 @@
+"""
+Capa de datos del Dashboard Financiero
+Autor: Enrique Alvarino
+Descripción: Índices enteros, firmas de versión y estructuras compartidas entre sesiones
+"""
+
+import os
+import time
+import unicodedata
+import importlib.util
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# ==================== CONSTANTES ====================
+# Se puede apuntar a otro libro (p. ej. datos sintéticos) con DASHBOARD_ARCHIVO
+ARCHIVO_EXCEL = os.environ.get(
+    'DASHBOARD_ARCHIVO', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DataExce.xlsx')
+)
+COLUMNA_CLIENTE = 'Numero  Identificación'
+COLUMNA_AUM = 'AUM Fin de Mes'
+DIMENSIONES = ['Segmento Mesa', 'Mesa', 'Asesor Comercial']
+HOJAS_EXCEL = ['Base 2017', 'Base 2018', 'Base 2019', 'Base 2020', 'Base 2021', 'Base 2022']
+MESES_ESPAÑOL = {
+    1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
+    5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
+    9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
+}
+
+# Segmentos válidos del esquema comercial (cualquier otro se reporta como desconocido)
+SEGMENTOS_CONOCIDOS = [
+    '1. BANCA PRIVADA', '2. BANCA PREFERENTE', '3. INVERSIONISTAS PLATA',
+    '4. INVERSIONISTAS ORO', '5. BANCA EMPRESARIAL'
+]
+
+# ==================== LECTURA DE EXCEL ====================
+# Solo las columnas que usa el dashboard (se omite, entre otras, la columna duplicada 'AUM Fin de Mes ')
+COLUMNAS_BASE = [
+    'Año', 'Numero de Mes', 'Segmento Mesa', 'Asesor Comercial', 'Mesa',
+    'Numero  Identificación', 'Nombre Cliente', 'AUM Fin de Mes', 'No.Clientes'
+]
+# Tipos compactos en memoria; los enteros pequeños solo se aplican tras validar y excluir
+# las filas fuera de RANGOS_BASE (un cast directo a int8 convierte el mes 257 en 1 sin aviso)
+TIPOS_BASE = {
+    'Numero  Identificación': 'str',
+    'Año': 'int16',
+    'Numero de Mes': 'int8',
+    'AUM Fin de Mes': 'float64',
+    'No.Clientes': 'int8'
+}
+# Tipos de lectura: numéricos anchos (float64 admite nulos y valores fuera de rango para validarlos)
+TIPOS_LECTURA = {columna: 'str' if tipo == 'str' else 'float64' for columna, tipo in TIPOS_BASE.items()}
+RANGOS_BASE = {
+    'Año': (1900, 2100),
+    'Numero de Mes': (1, 12),
+    'No.Clientes': (0, int(np.iinfo(np.int8).max))
+}
+# Motores de lectura del más rápido al más lento, con el módulo que requiere cada uno
+MOTORES_EXCEL = {'calamine': 'python_calamine', 'openpyxl': 'openpyxl'}
+MOTOR_EXCEL = os.environ.get('DASHBOARD_MOTOR_EXCEL', 'auto')
+
+def motores_disponibles():
+    """Motores de lectura instalados, en orden de preferencia"""
+    return [motor for motor, modulo in MOTORES_EXCEL.items() if importlib.util.find_spec(modulo) is not None]
+
+def _leer_hojas(archivo, motor, columnas=COLUMNAS_BASE):
+    """Lee todas las hojas abriendo el libro una sola vez con el motor indicado"""
+    with pd.ExcelFile(archivo, engine=motor) as libro:
+        hojas = pd.read_excel(libro, sheet_name=HOJAS_EXCEL, usecols=columnas, dtype=TIPOS_LECTURA)
+    return [hojas[hoja] for hoja in HOJAS_EXCEL]
+
+def leer_excel(archivo, motor=MOTOR_EXCEL):
+    """Lee el libro con el motor pedido ('auto' = el más rápido); si falla, prueba el siguiente"""
+    disponibles = motores_disponibles()
+    candidatos = disponibles if motor == 'auto' else [motor] + [m for m in disponibles if m != motor]
+    errores = []
+    for candidato in candidatos:
+        try:
+            return _leer_hojas(archivo, candidato), candidato
+        except Exception as e:
+            # Cada motor lanza sus propios errores (CalamineError, XmlError, ZipError, ...)
+            errores.append(f"{candidato}: {e}")
+    raise RuntimeError("No fue posible leer el archivo. " + " | ".join(errores))
+
+# ==================== AUM EN PUNTO FIJO ====================
+# 'AUM Fin de Mes' se guarda como int64 en centavos: las sumas son exactas y
+# solo se convierte a pesos (float) para mostrar o exportar
+ESCALA_AUM = 100
+
+def a_centavos(pesos):
+    """Convierte pesos (float) a centavos enteros redondeando al centavo"""
+    return np.round(np.asarray(pesos, dtype=np.float64) * ESCALA_AUM).astype(np.int64)
+
+def a_pesos(centavos):
+    """Convierte centavos a pesos para visualización (escalares, arreglos, Series o DataFrames)"""
+    return centavos / ESCALA_AUM
+
+def sumar_exacto(grupos, centavos, n_grupos):
+    """Suma entera exacta de centavos por grupo
+
+    np.bincount acumula pesos en float64; se parte cada valor en 26 bits altos y bajos
+    para que ninguna suma parcial supere 2**53 y el resultado entero sea exacto.
+    """
+    centavos = np.asarray(centavos, dtype=np.int64)
+    altos = np.bincount(grupos, weights=centavos >> 26, minlength=n_grupos)
+    bajos = np.bincount(grupos, weights=centavos & ((1 << 26) - 1), minlength=n_grupos)
+    return (altos.astype(np.int64) << 26) + bajos.astype(np.int64)
+
+# ==================== FORMATO EN MEMORIA ====================
+def optimizar_dataframe(df):
+    """Limpieza y columnas derivadas comunes a todas las fuentes de datos"""
+    # Limpieza de datos y tipos compactos (las filas fuera de RANGOS_BASE ya fueron excluidas)
+    df = df.fillna(0)
+    df = df.astype({columna: TIPOS_BASE[columna] for columna in RANGOS_BASE})
+    df[COLUMNA_AUM] = a_centavos(df[COLUMNA_AUM])
+    
+    # Crear columnas derivadas útiles
+    df['Fecha'] = pd.to_datetime(pd.DataFrame({
+        'year': df['Año'],
+        'month': df['Numero de Mes'],
+        'day': 1
+    }))
+    
+    # Nombre del mes
+    df['Mes_Nombre'] = df['Numero de Mes'].map(MESES_ESPAÑOL)
+    return df
+
+# ==================== VALIDACIÓN DE CALIDAD ====================
+MAX_EJEMPLOS_CALIDAD = 5
+
+def _ejemplos(df, mascara):
+    """Primeros registros que incumplen una regla (año, mes y cliente)"""
+    posiciones = np.flatnonzero(mascara)[:MAX_EJEMPLOS_CALIDAD]
+    columnas = ['Año', 'Numero de Mes', COLUMNA_CLIENTE]
+    valores = {c: df[c].to_numpy()[posiciones] for c in columnas} if len(posiciones) else {}
+    texto = lambda v: format(v, '.15g') if isinstance(v, float) else str(v)
+    return [{c: texto(valores[c][i]) for c in columnas} for i in range(len(posiciones))]
+
+def validar_calidad(df, nulos=None):
+    """Reglas de calidad y estadísticas por columna con una pasada vectorizada por columna
+
+    Se evalúa sobre los valores crudos (numéricos en float64). Devuelve el resumen para el
+    manifiesto y la máscara de filas fuera de RANGOS_BASE, que se excluyen; las demás reglas solo se reportan.
+    `nulos` recibe los nulos que la fuente ya rellenó (p. ej. la ingesta por bloques).
+    """
+    inicio = time.perf_counter()
+    nulos = nulos or {}
+    columnas, reglas, enteros = {}, {}, {}
+    excluidas = np.zeros(len(df), dtype=bool)
+
+    for columna in COLUMNAS_BASE:
+        valores = df[columna]
+        nulos_columna = int(valores.isna().sum())
+        estadisticas = {'nulos': nulos_columna + int(nulos.get(columna, 0))}
+        if columna in TIPOS_BASE and TIPOS_BASE[columna] != 'str':
+            numeros = valores.to_numpy(dtype=np.float64)
+            hay_datos = len(numeros) > nulos_columna
+            estadisticas['mínimo'] = float(np.nanmin(numeros)) if hay_datos else None
+            estadisticas['máximo'] = float(np.nanmax(numeros)) if hay_datos else None
+            if columna == COLUMNA_AUM:
+                reglas['AUM negativo'] = numeros < 0
+                estadisticas['negativos'] = int(reglas['AUM negativo'].sum())
+                estadisticas['ceros'] = int((numeros == 0).sum())
+            elif columna in RANGOS_BASE:
+                minimo, maximo = RANGOS_BASE[columna]
+                # Enteros dentro del rango del tipo compacto; la comparación con NaN es falsa
+                fuera = ~((numeros >= minimo) & (numeros <= maximo) & (numeros == np.floor(numeros)))
+                if columna == 'No.Clientes':
+                    # Un conteo nulo se toma como 0, como en el resto de la limpieza
+                    fuera &= ~np.isnan(numeros)
+                etiqueta = 'Mes' if columna == 'Numero de Mes' else columna
+                reglas[f"{etiqueta} fuera de {minimo}-{maximo}"] = fuera
+                excluidas |= fuera
+                enteros[columna] = np.where(fuera, 0, np.nan_to_num(numeros)).astype(np.int64)
+        elif columna in (COLUMNA_CLIENTE, 'Segmento Mesa'):
+            codigos, unicos = pd.factorize(valores)
+            estadisticas['únicos'] = len(unicos)
+            enteros[columna] = codigos.astype(np.int64)
+            if columna == 'Segmento Mesa':
+                # Código -1 (nulo) cae en el último elemento: desconocido
+                conocido = np.append(np.isin(unicos.astype(str), SEGMENTOS_CONOCIDOS), False)
+                reglas['Segmento desconocido'] = ~conocido[codigos]
+        columnas[columna] = estadisticas
+
+    # Un registro por cliente y mes: clave entera cliente × (año, mes) sin tocar los textos otra vez;
+    # las filas excluidas reciben claves negativas únicas para no marcarse como duplicadas
+    clave = (
+        (enteros[COLUMNA_CLIENTE] << 24) + ((enteros['Año'] & 0xFFFF) << 8) + (enteros['Numero de Mes'] & 0xFF)
+    )
+    clave[excluidas] = -1 - np.arange(int(excluidas.sum()))
+    # Ordenar la clave es más barato que un hash de 5M filas; se marcan todas las filas de cada clave repetida
+    ordenada = np.sort(clave)
+    repetidos = ordenada[1:][ordenada[1:] == ordenada[:-1]]
+    reglas['Cliente/mes duplicado'] = (
+        np.isin(clave, repetidos) if len(repetidos) else np.zeros(len(clave), dtype=bool)
+    )
+
+    resumen = {
+        'reglas': {
+            regla: {'filas': int(mascara.sum()), 'ejemplos': _ejemplos(df, mascara)}
+            for regla, mascara in reglas.items()
+        },
+        'columnas': columnas,
+        'filas_excluidas': int(excluidas.sum()),
+        'validacion_s': time.perf_counter() - inicio
+    }
+    return resumen, excluidas
+
+def preparar_dataframe(df, nulos=None):
+    """Valida el DataFrame consolidado con sus valores crudos, excluye las filas inválidas y lo optimiza"""
+    calidad, excluidas = validar_calidad(df, nulos)
+    if excluidas.any():
+        df = df[~excluidas].reset_index(drop=True)
+    return optimizar_dataframe(df), calidad
+
+# ==================== FUNCIONES DE CARGA Y CACHÉ ====================
+# cache_resource: todas las sesiones comparten el mismo DataFrame (sin copias por rerun);
+# es de solo lectura, las vistas copian únicamente las filas que muestran o exportan.
+# La llave es version_datos(): si el libro cambia (p. ej. se agrega un mes) se vuelve a leer,
+# y los cálculos por mes cacheados por firma se reutilizan para los meses que no cambiaron
+@st.cache_resource(show_spinner="Cargando datos... Por favor espera 🔄", max_entries=2)
+def cargar_datos(version):
+    """Carga y consolida datos de todos los años con optimización de memoria"""
+    archivo_excel = ARCHIVO_EXCEL
+    
+    try:
+        # Cargar todas las hojas de forma eficiente (columnas proyectadas, libro abierto una vez)
+        inicio = time.perf_counter()
+        dataframes, motor = leer_excel(archivo_excel)
+        segundos_lectura = time.perf_counter() - inicio
+        
+        # Consolidar, validar y optimizar datos
+        df_consolidado, calidad = preparar_dataframe(pd.concat(dataframes, ignore_index=True))
+        
+        df_consolidado.attrs['manifiesto'] = {
+            'carga': {
+                'archivo': os.path.basename(archivo_excel),
+                'motor': motor,
+                'hojas': len(dataframes),
+                'columnas': len(COLUMNAS_BASE),
+                'filas': len(df_consolidado),
+                'lectura_s': segundos_lectura,
+                'total_s': time.perf_counter() - inicio,
+                'memoria_mb': df_consolidado.memory_usage(deep=True).sum() / 1024**2
+            },
+            'calidad': calidad
+        }
+        
+        return df_consolidado
+    
+    except Exception as e:
+        st.error(f"Error al cargar datos: {str(e)}")
+        return None
+
+@st.cache_data(show_spinner="Comparando motores de lectura...")
+def comparar_motores_lectura(archivo, version):
+    """Tiempo de lectura del libro con cada motor, con y sin proyección de columnas"""
+    resultados = []
+    pruebas = [(motor, COLUMNAS_BASE, 'Proyectadas') for motor in MOTORES_EXCEL]
+    pruebas.append(('openpyxl', None, 'Todas'))
+    for motor, columnas, etiqueta in pruebas:
+        fila = {'Motor': motor, 'Columnas': etiqueta, 'Segundos': None, 'Filas': None}
+        if motor not in motores_disponibles():
+            fila['Estado'] = 'No instalado'
+        else:
+            inicio = time.perf_counter()
+            hojas = _leer_hojas(archivo, motor, columnas)
+            fila['Segundos'] = time.perf_counter() - inicio
+            fila['Filas'] = sum(len(h) for h in hojas)
+            fila['Estado'] = 'OK'
+        resultados.append(fila)
+    
+    df_resultados = pd.DataFrame(resultados)
+    referencia = df_resultados.loc[df_resultados['Columnas'] == 'Todas', 'Segundos'].iloc[0]
+    df_resultados['Aceleración'] = referencia / df_resultados['Segundos']
+    return df_resultados
+
+@st.cache_data
+def listar_dimensiones(_df, version):
+    """Opciones de los filtros del sidebar (cacheadas por versión, sin hashear el DataFrame)"""
+    return {
+        'años': sorted(_df['Año'].unique()),
+        'meses': sorted(_df['Numero de Mes'].unique()),
+        'segmentos': sorted(_df['Segmento Mesa'].unique()),
+        'mesas': sorted(_df['Mesa'].unique()),
+        'top_asesores': _df.groupby('Asesor Comercial')['AUM Fin de Mes'].sum().nlargest(20).index.tolist()
+    }
+
+# ==================== VERSIÓN DE DATOS ====================
+def version_datos(archivo=ARCHIVO_EXCEL):
+    """Firma del archivo fuente (fecha de modificación y tamaño) usada como llave de caché"""
+    try:
+        info = os.stat(archivo)
+    except OSError:
+        return 'sin-archivo'
+    return f"{info.st_mtime_ns}-{info.st_size}"
+
+# ==================== ÍNDICES ENTEROS ====================
+@st.cache_resource(show_spinner="Indexando datos...", max_entries=4)
+def indexar_datos(_df, version):
+    """Codifica clientes, dimensiones y meses como enteros; se construye una vez por versión"""
+    indice = {'version': version, 'n_filas': len(_df)}
+
+    # Clientes y dimensiones como códigos enteros ordenados
+    codigos, clientes = pd.factorize(_df[COLUMNA_CLIENTE], sort=True)
+    indice['cliente'] = codigos.astype(np.int32)
+    indice['clientes'] = clientes
+    # Nombre de cada cliente (el del último registro en que aparece)
+    nombres = np.empty(len(clientes), dtype=object)
+    nombres[codigos] = _df['Nombre Cliente'].astype(str).to_numpy()
+    indice['nombres'] = nombres
+
+    indice['dimensiones'] = {}
+    for dimension in DIMENSIONES:
+        codigos, valores = pd.factorize(_df[dimension], sort=True)
+        indice['dimensiones'][dimension] = (codigos.astype(np.int32), valores)
+
+    # Meses presentes en los datos como periodos consecutivos 0..n-1
+    periodo_absoluto = (
+        _df['Año'].to_numpy(dtype=np.int32) * 12 +
+        _df['Numero de Mes'].to_numpy(dtype=np.int32) - 1
+    )
+    presentes, periodo = np.unique(periodo_absoluto, return_inverse=True)
+    indice['periodo'] = periodo.astype(np.int32)
+    indice['fechas'] = pd.DatetimeIndex(pd.to_datetime(pd.DataFrame({
+        'year': presentes // 12,
+        'month': presentes % 12 + 1,
+        'day': 1
+    })))
+
+    indice['año'] = indice['fechas'].year.to_numpy()[periodo].astype(np.int16)
+    indice['mes'] = indice['fechas'].month.to_numpy()[periodo].astype(np.int8)
+
+    indice['aum'] = _df[COLUMNA_AUM].to_numpy(dtype=np.int64)
+    indice['no_clientes'] = _df['No.Clientes'].to_numpy(dtype=np.int64)
+
+    # Filas agrupadas por mes: orden estable + desplazamientos por periodo
+    orden = np.argsort(indice['periodo'], kind='stable')
+    conteos = np.bincount(indice['periodo'], minlength=len(presentes))
+    indice['orden_periodo'] = orden
+    indice['offsets_periodo'] = np.concatenate(([0], np.cumsum(conteos)))
+
+    # Filas agrupadas por asesor (en orden cronológico dentro de cada asesor)
+    asesor, asesores = indice['dimensiones']['Asesor Comercial']
+    indice['orden_asesor'] = orden[np.argsort(asesor[orden], kind='stable')]
+    indice['offsets_asesor'] = np.concatenate(([0], np.cumsum(np.bincount(asesor, minlength=len(asesores)))))
+
+    # Firma de contenido por mes: permite reutilizar cálculos de meses que no cambiaron;
+    # incluye toda columna que lean los cálculos cacheados por firma (nombres y conteo de clientes)
+    hash_filas = pd.util.hash_pandas_object(
+        _df[['Año', 'Numero de Mes', COLUMNA_CLIENTE, 'Nombre Cliente', 'No.Clientes', COLUMNA_AUM] + DIMENSIONES],
+        index=False
+    ).to_numpy()
+    if len(orden):
+        sumas = np.add.reduceat(hash_filas[orden], indice['offsets_periodo'][:-1])
+    else:
+        sumas = np.array([], dtype=np.uint64)
+    indice['firmas'] = [f"{s:016x}-{c}" for s, c in zip(sumas, conteos)]
+
+    return indice
+
+def filas_filtro(indice, filtro):
+    """Posiciones (ordenadas) de las filas que cumplen un filtro {'años', 'meses', dimensión: valores}"""
+    mascara = np.isin(indice['año'], filtro['años']) & np.isin(indice['mes'], filtro['meses'])
+    for dimension in DIMENSIONES:
+        seleccion = filtro.get(dimension)
+        if not seleccion:
+            continue
+        codigos, valores = indice['dimensiones'][dimension]
+        permitidos = np.zeros(len(valores), dtype=bool)
+        posiciones = valores.get_indexer(seleccion)
+        permitidos[posiciones[posiciones >= 0]] = True
+        mascara &= permitidos[codigos]
+    return np.flatnonzero(mascara)
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def seleccion_filtro(_indice, version, filtro):
+    """Selección de filas de un filtro, calculada una vez por versión y compartida (solo lectura)"""
+    filas = filas_filtro(_indice, filtro)
+    filas.setflags(write=False)
+    return filas
+
+def filtro_por_defecto(dimensiones):
+    """Filtro inicial del sidebar: todos los años, meses, segmentos y mesas, sin filtro de asesor"""
+    return {
+        'años': dimensiones['años'],
+        'meses': dimensiones['meses'],
+        'Segmento Mesa': dimensiones['segmentos'],
+        'Mesa': dimensiones['mesas'],
+        'Asesor Comercial': []
+    }
+
+def ordenar_filas(indice, filas, columna, ascendente=True, n=None):
+    """Primeras `n` posiciones de una selección ordenada por columna, sin copiar el DataFrame"""
+    if columna == COLUMNA_AUM:
+        llave = indice['aum'][filas]
+    elif columna == 'Año':
+        llave = indice['año'][filas]
+    else:
+        # Los códigos de dimensión se asignaron en orden alfabético: ordenan igual que los valores
+        llave = indice['dimensiones'][columna][0][filas]
+    llave = llave.astype(np.int64)
+    orden = np.argsort(llave if ascendente else -llave, kind='stable')
+    return filas[orden[:n]]
+
+def filas_periodo(indice, periodo):
+    """Posiciones de las filas de un mes, sin copiar el DataFrame"""
+    inicio, fin = indice['offsets_periodo'][periodo], indice['offsets_periodo'][periodo + 1]
+    return indice['orden_periodo'][inicio:fin]
+
+def filas_asesor(indice, asesor):
+    """Posiciones de las filas de un asesor en orden cronológico; costo proporcional a sus filas"""
+    codigo = indice['dimensiones']['Asesor Comercial'][1].get_loc(asesor)
+    inicio, fin = indice['offsets_asesor'][codigo], indice['offsets_asesor'][codigo + 1]
+    return indice['orden_asesor'][inicio:fin]
+
+# ==================== BÚSQUEDA DE CLIENTES ====================
+def normalizar_texto(texto):
+    """Mayúsculas, sin tildes y con espacios simples, para comparar nombres e identificaciones"""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).upper().split())
+
+@st.cache_resource(show_spinner="Indexando clientes...", max_entries=4)
+def indexar_clientes(_indice, version):
+    """Palabras ordenadas de nombres e identificaciones, filas por cliente y último estado de cada uno"""
+    n_clientes = len(_indice['clientes'])
+
+    # Se normalizan solo los nombres distintos; luego cada palabra apunta a su cliente
+    codigos_nombre, nombres = pd.factorize(pd.Series(_indice['nombres'], dtype=object))
+    normalizados = pd.Series([normalizar_texto(n) for n in nombres], dtype=object)
+    palabras = pd.concat([
+        pd.Series(normalizados.to_numpy()[codigos_nombre]).str.split().explode(),
+        pd.Series([normalizar_texto(c) for c in _indice['clientes']])
+    ])
+    palabras = palabras[palabras.notna() & (palabras != '')]
+    pares = pd.DataFrame({'palabra': palabras.to_numpy(dtype=str), 'cliente': palabras.index.to_numpy()})
+    pares = pares.drop_duplicates().sort_values(['palabra', 'cliente'], kind='stable')
+
+    # Filas de cada cliente en orden cronológico
+    orden = _indice['orden_periodo']
+    orden = orden[np.argsort(_indice['cliente'][orden], kind='stable')]
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(_indice['cliente'], minlength=n_clientes))))
+    ultima_fila = orden[offsets[1:] - 1]
+
+    # AUM de cada cliente en su último mes con registros (puede tener varias filas ese mes)
+    ultimo_periodo = _indice['periodo'][ultima_fila]
+    en_ultimo = _indice['periodo'] == ultimo_periodo[_indice['cliente']]
+    aum_reciente = sumar_exacto(_indice['cliente'][en_ultimo], _indice['aum'][en_ultimo], n_clientes)
+
+    return {
+        'palabras': pares['palabra'].to_numpy(dtype=str),
+        'codigos': pares['cliente'].to_numpy(dtype=np.int32),
+        'orden_cliente': orden,
+        'offsets_cliente': offsets,
+        'ultima_fila': ultima_fila,
+        'aum_reciente': aum_reciente
+    }
+
+def buscar_clientes(busqueda, consulta, limite=50):
+    """Clientes con una palabra que empieza por cada término de la consulta, de mayor a menor AUM reciente"""
+    terminos = normalizar_texto(consulta).split()
+    if not terminos:
+        return np.array([], dtype=np.int32)
+    coincidencias = None
+    for termino in terminos:
+        # Rango de palabras con el prefijo por búsqueda binaria en el arreglo ordenado
+        inicio = np.searchsorted(busqueda['palabras'], termino, side='left')
+        fin = np.searchsorted(busqueda['palabras'], termino + '\U0010ffff', side='left')
+        codigos = np.unique(busqueda['codigos'][inicio:fin])
+        coincidencias = codigos if coincidencias is None else np.intersect1d(coincidencias, codigos, assume_unique=True)
+    orden = np.argsort(-busqueda['aum_reciente'][coincidencias], kind='stable')[:limite]
+    return coincidencias[orden]
+
+def filas_cliente(busqueda, cliente):
+    """Posiciones de las filas de un cliente (código entero) en orden cronológico"""
+    inicio, fin = busqueda['offsets_cliente'][cliente], busqueda['offsets_cliente'][cliente + 1]
+    return busqueda['orden_cliente'][inicio:fin]
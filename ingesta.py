@@ -0,0 +1,171 @@
+"""
+Ingesta de archivos cargados por el usuario
+Autor: Enrique Alvarino
+Descripción: Lectura por bloques en segundo plano de libros Excel y CSV con el esquema del dashboard
+"""
+
+import io
+import os
+import time
+import hashlib
+
+import pandas as pd
+
+from datos import COLUMNAS_BASE, TIPOS_LECTURA, preparar_dataframe
+from trabajos import RegistroTrabajos
+
+# ==================== CONFIGURACIÓN ====================
+FILAS_POR_BLOQUE = 50_000
+PRESUPUESTO_MEMORIA_MB = float(os.environ.get('DASHBOARD_PRESUPUESTO_MB', '1024'))
+MAX_TRABAJADORES = 2
+MAX_CARGAS_RETENIDAS = 3
+COLUMNAS_NUMERICAS = [c for c, tipo in TIPOS_LECTURA.items() if tipo != 'str']
+COLUMNAS_TEXTO = [c for c in COLUMNAS_BASE if c not in COLUMNAS_NUMERICAS]
+
+_registro = RegistroTrabajos('ingesta', MAX_TRABAJADORES, MAX_CARGAS_RETENIDAS)
+
+# ==================== ESTADO DE CARGAS ====================
+def version_archivo(contenido):
+    """Versión de datos de un archivo cargado: hash de su contenido"""
+    return 'carga-' + hashlib.sha1(contenido).hexdigest()[:16]
+
+def estado_carga(version):
+    """Copia del estado de una carga (sin el DataFrame), o None si no existe"""
+    return _registro.estado(version)
+
+def datos_carga(version):
+    """DataFrame de una carga terminada, o None"""
+    return _registro.resultado(version)
+
+def iniciar_carga(nombre, contenido):
+    """Encola el procesamiento de un archivo; un mismo contenido se procesa una sola vez"""
+    return _registro.iniciar(version_archivo(contenido), _procesar, nombre, contenido, nombre=nombre)
+
+# ==================== LECTURA POR BLOQUES ====================
+def _validar_columnas(columnas, origen):
+    faltantes = [c for c in COLUMNAS_BASE if c not in columnas]
+    if faltantes:
+        raise ValueError(f"{origen}: faltan las columnas {faltantes}")
+
+def _bloques_csv(contenido):
+    """Genera (bloque, progreso, origen) leyendo el CSV de a FILAS_POR_BLOQUE filas"""
+    muestra = contenido[:4096].decode('utf-8', errors='ignore')
+    encabezado = muestra.splitlines()[0] if muestra else ''
+    separador = ';' if encabezado.count(';') > encabezado.count(',') else ','
+    try:
+        contenido.decode('utf-8')
+        codificacion = 'utf-8-sig'
+    except UnicodeDecodeError:
+        codificacion = 'latin-1'
+
+    fuente = io.BytesIO(contenido)
+    columnas = pd.read_csv(fuente, sep=separador, encoding=codificacion, nrows=0).columns
+    _validar_columnas(list(columnas), 'CSV')
+    fuente.seek(0)
+
+    lector = pd.read_csv(
+        fuente, sep=separador, encoding=codificacion,
+        usecols=COLUMNAS_BASE, dtype={'Numero  Identificación': 'str'},
+        chunksize=FILAS_POR_BLOQUE
+    )
+    for bloque in lector:
+        yield bloque, fuente.tell() / max(len(contenido), 1), 'CSV'
+
+def _bloques_excel(contenido):
+    """Genera (bloque, progreso, hoja) recorriendo las hojas en modo de solo lectura"""
+    import openpyxl
+
+    libro = openpyxl.load_workbook(io.BytesIO(contenido), read_only=True, data_only=True)
+    try:
+        total_filas = sum(hoja.max_row or 0 for hoja in libro.worksheets) or 1
+        filas_leidas = 0
+        hojas_validas = 0
+        for hoja in libro.worksheets:
+            filas = hoja.iter_rows(values_only=True)
+            encabezado = [str(c) if c is not None else '' for c in next(filas, ())]
+            if any(c not in encabezado for c in COLUMNAS_BASE):
+                continue
+            hojas_validas += 1
+            posiciones = [encabezado.index(c) for c in COLUMNAS_BASE]
+            pendientes = []
+            for fila in filas:
+                if all(valor is None for valor in fila):
+                    continue
+                pendientes.append([fila[p] if p < len(fila) else None for p in posiciones])
+                if len(pendientes) == FILAS_POR_BLOQUE:
+                    filas_leidas += len(pendientes)
+                    yield pd.DataFrame(pendientes, columns=COLUMNAS_BASE), filas_leidas / total_filas, hoja.title
+                    pendientes = []
+            if pendientes:
+                filas_leidas += len(pendientes)
+                yield pd.DataFrame(pendientes, columns=COLUMNAS_BASE), filas_leidas / total_filas, hoja.title
+        if hojas_validas == 0:
+            raise ValueError(f"Excel: ninguna hoja contiene las columnas {COLUMNAS_BASE}")
+    finally:
+        libro.close()
+
+def _convertir_bloque(bloque, desplazamiento):
+    """Valida tipos y los aplica al bloque; devuelve también los nulos rellenados por columna
+
+    Los numéricos quedan anchos (float64, con sus nulos) hasta que preparar_dataframe valide
+    sus rangos; solo se rellenan los textos.
+    """
+    nulos = bloque[COLUMNAS_TEXTO].isna().sum()
+    for columna in COLUMNAS_NUMERICAS:
+        numeros = pd.to_numeric(bloque[columna], errors='coerce')
+        invalidos = numeros.isna() & bloque[columna].notna()
+        if invalidos.any():
+            fila = desplazamiento + int(invalidos.to_numpy().argmax()) + 2
+            raise ValueError(
+                f"'{columna}' tiene {int(invalidos.sum())} valores no numéricos (primero en la fila {fila})"
+            )
+        bloque[columna] = numeros.astype(TIPOS_LECTURA[columna])
+    for columna in COLUMNAS_TEXTO:
+        bloque[columna] = bloque[columna].fillna(0).astype(str)
+    return bloque.reset_index(drop=True), nulos
+
+def _procesar(version, nombre, contenido):
+    """Trabajo en segundo plano: lee, valida y consolida los bloques del archivo"""
+    inicio = time.perf_counter()
+    _registro.actualizar(version, etapa='leyendo')
+    es_csv = nombre.lower().endswith('.csv')
+    bloques_fuente = _bloques_csv(contenido) if es_csv else _bloques_excel(contenido)
+
+    bloques, filas, memoria, origenes, nulos = [], 0, 0, set(), 0
+    for bloque, progreso, origen in bloques_fuente:
+        bloque, nulos_bloque = _convertir_bloque(bloque, filas)
+        nulos = nulos_bloque + nulos
+        filas += len(bloque)
+        memoria += bloque.memory_usage(deep=True).sum()
+        # La consolidación final duplica momentáneamente los bloques
+        if 2 * memoria / 1024**2 > PRESUPUESTO_MEMORIA_MB:
+            raise ValueError(
+                f"El archivo excede el presupuesto de memoria de {PRESUPUESTO_MEMORIA_MB:.0f} MB"
+            )
+        bloques.append(bloque)
+        origenes.add(origen)
+        _registro.actualizar(version, progreso=min(progreso, 0.99), etapa=f"{filas:,} filas leídas")
+
+    if not bloques:
+        raise ValueError("El archivo no contiene registros")
+
+    _registro.actualizar(version, etapa='consolidando')
+    df = pd.concat(bloques, ignore_index=True)
+    del bloques
+    # Reglas de calidad sobre el archivo completo (los duplicados cruzan bloques)
+    _registro.actualizar(version, etapa='validando')
+    df, calidad = preparar_dataframe(df, nulos.to_dict())
+    df.attrs['manifiesto'] = {
+        'carga': {
+            'archivo': nombre,
+            'motor': 'csv por bloques' if es_csv else 'openpyxl por bloques',
+            'hojas': len(origenes),
+            'columnas': len(COLUMNAS_BASE),
+            'filas': len(df),
+            'lectura_s': time.perf_counter() - inicio,
+            'total_s': time.perf_counter() - inicio,
+            'memoria_mb': df.memory_usage(deep=True).sum() / 1024**2
+        },
+        'calidad': calidad
+    }
+    return df
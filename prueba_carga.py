@@ -0,0 +1,174 @@
+"""
+Prueba de carga del Dashboard con sesiones concurrentes
+Simula N analistas que cambian filtros y la tabla detallada al mismo tiempo y mide
+la latencia de cada rerun (p50/p95/p99), el throughput y la memoria del proceso
+
+Las sesiones corren como hilos de un mismo proceso con AppTest, igual que en el
+servidor de Streamlit, por lo que comparten las cachés de datos y de índices.
+Funciona sin red: los datos se generan con generar_datos_demo.py.
+
+Uso:
+    python prueba_carga.py [--sesiones 1,2,4,8] [--interacciones 10] [--clientes 1000]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+
+import numpy as np
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(DIRECTORIO, 'Dashboard.py')
+
+# ==================== DATOS SINTÉTICOS ====================
+def generar_archivo(directorio, num_clientes, num_asesores):
+    """Genera un libro sintético con el esquema del dashboard y devuelve su ruta"""
+    from generar_datos_demo import generar_datos_demo, guardar_excel
+
+    archivo = os.path.join(directorio, 'datos_sinteticos.xlsx')
+    with contextlib.redirect_stdout(io.StringIO()):
+        guardar_excel(generar_datos_demo(num_clientes, num_asesores), archivo)
+    return archivo
+
+# ==================== MEMORIA ====================
+def memoria_mb():
+    """Memoria residente actual del proceso (MB); en sistemas sin /proc, el pico"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# ==================== INTERACCIONES ====================
+def _widget(elementos, etiqueta):
+    return next(e for e in elementos if e.label == etiqueta)
+
+def _subconjunto(rng, opciones, minimo=1):
+    return rng.sample(list(opciones), rng.randint(minimo, len(opciones)))
+
+def interaccion_aleatoria(at, rng):
+    """Aplica un cambio aleatorio de filtros o de tabla; devuelve su nombre"""
+    cambios = {
+        'años': lambda: _widget(at.sidebar.multiselect, "Selecciona Año(s):"),
+        'meses': lambda: _widget(at.sidebar.multiselect, "Selecciona Mes(es):"),
+        'segmentos': lambda: _widget(at.sidebar.multiselect, "Selecciona Segmento(s):"),
+        'asesores': lambda: _widget(at.sidebar.multiselect, "Selecciona Asesor(es) (Top 20):"),
+        'ordenar': lambda: _widget(at.selectbox, "Ordenar por:"),
+        'orden': lambda: _widget(at.radio, "Orden:"),
+        'registros': lambda: _widget(at.slider, "Número de registros a mostrar:")
+    }
+    nombre = rng.choice(list(cambios))
+    widget = cambios[nombre]()
+    if nombre == 'asesores':
+        widget.set_value(rng.sample(list(widget.options), rng.randint(0, 3)))
+    elif nombre in ('años', 'meses', 'segmentos'):
+        widget.set_value(_subconjunto(rng, widget.options))
+    elif nombre == 'registros':
+        widget.set_value(rng.randrange(10, 1001, 10))
+    else:
+        widget.set_value(rng.choice(list(widget.options)))
+    return nombre
+
+# ==================== SESIONES ====================
+def simular_sesion(semilla, interacciones, resultados, candado):
+    """Una sesión: carga inicial y `interacciones` reruns con cambios aleatorios"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(semilla)
+    at = AppTest.from_file(SCRIPT, default_timeout=600)
+    mediciones = []
+    for paso in range(interacciones + 1):
+        nombre = 'inicial' if paso == 0 else interaccion_aleatoria(at, rng)
+        inicio = time.perf_counter()
+        at.run()
+        mediciones.append((nombre, time.perf_counter() - inicio, len(at.exception)))
+    with candado:
+        resultados.extend(mediciones)
+
+def medir_concurrencia(sesiones, interacciones, semilla):
+    """Ejecuta `sesiones` sesiones simultáneas y resume latencias, throughput y memoria"""
+    resultados, candado = [], threading.Lock()
+    hilos = [
+        threading.Thread(
+            target=simular_sesion,
+            args=(semilla * 1000 + i, interacciones, resultados, candado),
+            name=f'sesion-{i}'
+        )
+        for i in range(sesiones)
+    ]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    # La carga inicial se reporta aparte: las interacciones son las que siente el analista
+    latencias = np.array([s for nombre, s, _ in resultados if nombre != 'inicial'])
+    iniciales = np.array([s for nombre, s, _ in resultados if nombre == 'inicial'])
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) if len(latencias) else (np.nan,) * 3
+    return {
+        'sesiones': sesiones,
+        'reruns': len(resultados),
+        'inicial_s': float(np.median(iniciales)),
+        'p50_s': p50,
+        'p95_s': p95,
+        'p99_s': p99,
+        'reruns_s': len(resultados) / duracion,
+        'memoria_mb': memoria_mb(),
+        'errores': sum(errores > 0 for _, _, errores in resultados)
+    }
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sesiones', default='1,2,4,8', help="Niveles de concurrencia separados por coma")
+    parser.add_argument('--interacciones', type=int, default=10, help="Reruns por sesión tras la carga inicial")
+    parser.add_argument('--clientes', type=int, default=1000)
+    parser.add_argument('--asesores', type=int, default=50)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    niveles = [int(n) for n in args.sesiones.split(',')]
+
+    random.seed(args.semilla)
+    np.random.seed(args.semilla)
+    sys.path.insert(0, DIRECTORIO)
+
+    print("=" * 78)
+    print("  PRUEBA DE CARGA - SESIONES CONCURRENTES")
+    print("=" * 78)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        print(f"  Generando datos sintéticos ({args.clientes:,} clientes, {args.asesores} asesores)...")
+        # Debe definirse antes de que la primera sesión importe datos.py
+        os.environ['DASHBOARD_ARCHIVO'] = generar_archivo(directorio, args.clientes, args.asesores)
+        memoria_base = memoria_mb()
+
+        # Sesión de calentamiento: carga el libro y llena las cachés compartidas
+        inicio = time.perf_counter()
+        simular_sesion(args.semilla, 0, [], threading.Lock())
+        print(f"  Arranque en frío: {time.perf_counter() - inicio:.2f} s")
+        print(f"  Interacciones por sesión: {args.interacciones}")
+        print()
+        print(f"  {'Sesiones':>8} {'Reruns':>7} {'Inicial':>8} {'p50':>7} {'p95':>7} {'p99':>7} "
+              f"{'Reruns/s':>9} {'RSS MB':>8} {'Errores':>8}")
+
+        for sesiones in niveles:
+            r = medir_concurrencia(sesiones, args.interacciones, args.semilla)
+            print(f"  {r['sesiones']:>8} {r['reruns']:>7} {r['inicial_s']:>7.2f}s {r['p50_s']:>6.2f}s "
+                  f"{r['p95_s']:>6.2f}s {r['p99_s']:>6.2f}s {r['reruns_s']:>9.2f} "
+                  f"{r['memoria_mb']:>8.0f} {r['errores']:>8}")
+
+        print()
+        print(f"  Memoria antes de las sesiones: {memoria_base:.0f} MB")
+    print("=" * 78)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Reporte PDF del Dashboard
+Autor: Enrique Alvarino
+Descripción: Generación en segundo plano de un PDF con KPIs, gráficos estáticos y tablas
+de la vista filtrada, sin conexión a servicios externos (matplotlib + reportlab)
+"""
+
+import io
+import hashlib
+import importlib.util
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from trabajos import RegistroTrabajos
+
+# ==================== CONFIGURACIÓN ====================
+MAX_TRABAJADORES = 2
+MAX_REPORTES_RETENIDOS = 5
+MODULOS_PDF = ['reportlab', 'matplotlib']
+COLOR_PRINCIPAL = '#1f77b4'
+
+_registro = RegistroTrabajos('reporte', MAX_TRABAJADORES, MAX_REPORTES_RETENIDOS)
+
+def pdf_disponible():
+    """True si están instaladas las dependencias para generar el PDF"""
+    return all(importlib.util.find_spec(modulo) is not None for modulo in MODULOS_PDF)
+
+# ==================== ESTADO DE REPORTES ====================
+def _agregar_huella(huella, valor):
+    """Actualiza el hash con DataFrames (por contenido), colecciones anidadas y escalares"""
+    if isinstance(valor, pd.DataFrame):
+        huella.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+        huella.update(repr(list(valor.columns)).encode('utf-8'))
+    elif isinstance(valor, dict):
+        for llave in sorted(valor):
+            huella.update(repr(llave).encode('utf-8'))
+            _agregar_huella(huella, valor[llave])
+    elif isinstance(valor, (list, tuple)):
+        for elemento in valor:
+            _agregar_huella(huella, elemento)
+    else:
+        huella.update(repr(valor).encode('utf-8'))
+
+def clave_reporte(contenido):
+    """Hash del contenido agregado del reporte: mismos datos, mismo PDF"""
+    huella = hashlib.sha1()
+    _agregar_huella(huella, contenido)
+    return 'reporte-' + huella.hexdigest()[:16]
+
+def estado_reporte(clave):
+    """Copia del estado de un reporte (sin el PDF), o None si no existe"""
+    return _registro.estado(clave)
+
+def pdf_reporte(clave):
+    """Bytes del PDF de un reporte terminado, o None"""
+    return _registro.resultado(clave)
+
+def iniciar_reporte(contenido):
+    """Encola la generación del PDF; un mismo contenido se genera una sola vez"""
+    return _registro.iniciar(clave_reporte(contenido), _generar, contenido)
+
+# ==================== GRÁFICOS ESTÁTICOS ====================
+# Tipos de gráfico y forma de `datos` (primera columna = eje x o categoría):
+#   barras, barras_h, torta: (x, y)
+#   lineas, apiladas: (x, serie 1, serie 2, ...), una línea o barra apilada por columna
+#   cascada: (concepto, monto), primer monto absoluto, intermedios relativos y el último total
+#   pareto: (serie, % clientes, % AUM), una curva por serie y la diagonal uniforme
+#   pronostico: (fecha, Histórico, Ajuste, Pronóstico, Inferior, Superior) con NaN fuera de cada tramo
+@st.cache_data(show_spinner=False, max_entries=128)
+def renderizar_grafico(tipo, datos, titulo):
+    """PNG de un gráfico; se cachea por el hash de los datos agregados que recibe"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    # API orientada a objetos (sin pyplot): segura para hilos del pool
+    figura = Figure(figsize=(8, 3.6), dpi=120)
+    FigureCanvasAgg(figura)
+    ejes = figura.add_subplot()
+    x, y = datos.columns[0], datos.columns[1]
+    leyenda = False
+
+    if tipo == 'barras':
+        ejes.bar(datos[x].astype(str), datos[y], color=COLOR_PRINCIPAL)
+        ejes.tick_params(axis='x', labelrotation=30)
+    elif tipo == 'barras_h':
+        ejes.barh(datos[x].astype(str)[::-1], datos[y][::-1], color=COLOR_PRINCIPAL)
+    elif tipo == 'lineas':
+        for columna in datos.columns[1:]:
+            ejes.plot(datos[x], datos[columna], marker='o', markersize=3, label=str(columna))
+        leyenda = len(datos.columns) > 2
+    elif tipo == 'apiladas':
+        positivos = np.zeros(len(datos))
+        negativos = np.zeros(len(datos))
+        ancho = 20 if pd.api.types.is_datetime64_any_dtype(datos[x]) else 0.8
+        for columna in datos.columns[1:]:
+            valores = datos[columna].to_numpy(dtype=float)
+            base = np.where(valores >= 0, positivos, negativos)
+            ejes.bar(datos[x], valores, bottom=base, width=ancho, label=str(columna))
+            positivos += np.clip(valores, 0, None)
+            negativos += np.clip(valores, None, 0)
+        leyenda = True
+    elif tipo == 'cascada':
+        montos = datos[y].to_numpy(dtype=float)
+        cambios = montos[1:-1]
+        inicios = np.concatenate(([0], montos[0] + np.concatenate(([0], np.cumsum(cambios)[:-1])), [0]))
+        alturas = np.concatenate(([montos[0]], cambios, [montos[0] + cambios.sum()]))
+        colores = ['steelblue'] + ['green' if c >= 0 else 'red' for c in cambios] + ['steelblue']
+        ejes.bar(datos[x].astype(str), alturas, bottom=inicios, color=colores)
+        extremos = np.concatenate((inicios, inicios + alturas))
+        ejes.set_ylim(min(extremos.min(), 0), extremos.max() * 1.05)
+    elif tipo == 'pareto':
+        ejes.plot([0, 100], [0, 100], color='gray', linestyle='--', label='Distribución uniforme')
+        for serie, curva in datos.groupby(x, sort=False):
+            ejes.plot(curva.iloc[:, 1], curva.iloc[:, 2], label=str(serie))
+        ejes.set_xlabel(datos.columns[1])
+        y = datos.columns[2]
+        leyenda = True
+    elif tipo == 'pronostico':
+        ejes.plot(datos[x], datos['Histórico'], color=COLOR_PRINCIPAL, label='Histórico')
+        ejes.plot(datos[x], datos['Ajuste'], color='gray', linestyle=':', label='Ajuste')
+        ejes.fill_between(datos[x], datos['Inferior'], datos['Superior'], color='orange', alpha=0.25, label='Banda')
+        ejes.plot(datos[x], datos['Pronóstico'], color='orange', marker='o', markersize=3, label='Pronóstico')
+        y = 'AUM (Pesos)'
+        leyenda = True
+    elif tipo == 'torta':
+        ejes.pie(datos[y], labels=datos[x].astype(str), autopct='%1.1f%%', textprops={'fontsize': 7})
+        ejes.axis('equal')
+    else:
+        raise ValueError(f"Tipo de gráfico desconocido: {tipo}")
+
+    if tipo != 'torta':
+        # Con varias series el nombre de cada una va en la leyenda
+        if tipo != 'barras_h' and (tipo not in ('lineas', 'apiladas') or len(datos.columns) == 2):
+            ejes.set_ylabel(y)
+        ejes.grid(axis='y' if tipo != 'barras_h' else 'x', alpha=0.3)
+    if leyenda:
+        ejes.legend(fontsize=6, loc='best')
+    ejes.set_title(titulo, fontsize=11)
+    figura.tight_layout()
+
+    salida = io.BytesIO()
+    figura.savefig(salida, format='png')
+    return salida.getvalue()
+
+# ==================== ARMADO DEL PDF ====================
+def _tabla(datos, formatos):
+    """Tabla de reportlab a partir de un DataFrame con formatos por columna"""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    filas = [list(datos.columns)]
+    for _, fila in datos.iterrows():
+        filas.append([
+            formatos.get(columna, '{}').format(valor) if pd.notna(valor) else '-'
+            for columna, valor in fila.items()
+        ])
+    tabla = Table(filas, repeatRows=1)
+    tabla.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(COLOR_PRINCIPAL)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0f2f6')]),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey)
+    ]))
+    return tabla
+
+def _generar(clave, contenido):
+    """Trabajo en segundo plano: renderiza los gráficos y arma el PDF"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak
+
+    # Los gráficos sin datos (p. ej. una selección vacía) se omiten
+    graficos = [
+        (tipo, datos, titulo) for tipo, datos, titulo in contenido['graficos']
+        if datos.iloc[:, 1:].notna().any(axis=None) and (tipo != 'torta' or datos.iloc[:, 1].sum() > 0)
+    ]
+    imagenes = []
+    for i, (tipo, datos, titulo) in enumerate(graficos):
+        _registro.actualizar(clave, etapa=f"gráfico {i + 1} de {len(graficos)}", progreso=i / (len(graficos) + 1))
+        imagenes.append(renderizar_grafico(tipo, datos, titulo))
+
+    _registro.actualizar(clave, etapa='armando PDF', progreso=len(graficos) / (len(graficos) + 1))
+    estilos = getSampleStyleSheet()
+    elementos = [
+        Paragraph("Dashboard Financiero - Análisis de AUMs", estilos['Title']),
+        Paragraph(f"Generado el {datetime.now():%Y-%m-%d %H:%M}", estilos['Normal']),
+        Paragraph(contenido['filtros'], estilos['Normal']),
+        Spacer(1, 0.4 * cm),
+        Paragraph("Indicadores Clave de Desempeño", estilos['Heading2']),
+        _tabla(contenido['kpis'], {}),
+        Spacer(1, 0.4 * cm)
+    ]
+    for imagen in imagenes:
+        elementos += [Image(io.BytesIO(imagen), width=17 * cm, height=7.65 * cm), Spacer(1, 0.3 * cm)]
+
+    elementos.append(PageBreak())
+    for titulo, datos, formatos in contenido['tablas']:
+        elementos += [Paragraph(titulo, estilos['Heading2']), _tabla(datos, formatos), Spacer(1, 0.4 * cm)]
+
+    salida = io.BytesIO()
+    SimpleDocTemplate(
+        salida, pagesize=A4, title="Reporte de AUMs",
+        leftMargin=2 * cm, rightMargin=2 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm
+    ).build(elementos)
+    return salida.getvalue()
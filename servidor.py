@@ -0,0 +1,146 @@
+"""
+Arranque del Dashboard con precalentamiento de caché
+Autor: Enrique Alvarino
+Descripción: Carga datos y agregados por defecto en segundo plano al iniciar el servidor
+y expone un endpoint de salud para el balanceador de carga
+
+Uso:
+    python servidor.py [opciones de streamlit run]
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PUERTO_SALUD = int(os.environ.get('DASHBOARD_PUERTO_SALUD', '8502'))
+
+# ==================== ESTADO DE PRECALENTAMIENTO ====================
+_estado = {
+    'listo': False,
+    'etapa': 'pendiente',
+    'error': None,
+    'inicio': None,
+    'duracion_s': None
+}
+_candado = threading.Lock()
+_hilo = None
+
+def estado_precalentamiento():
+    """Copia del estado actual del precalentamiento"""
+    with _candado:
+        return dict(_estado)
+
+def _actualizar_estado(**cambios):
+    with _candado:
+        _estado.update(cambios)
+
+def _esperar_runtime(limite_s=30):
+    """Espera a que exista el runtime de Streamlit para compartir sus cachés"""
+    from streamlit import runtime
+    limite = time.time() + limite_s
+    while not runtime.exists() and time.time() < limite:
+        time.sleep(0.2)
+
+def _precalentar():
+    """Carga datos, listas de filtros y agregados con los filtros por defecto"""
+    _esperar_runtime()
+
+    from datos import (
+        cargar_datos, listar_dimensiones, version_datos, indexar_datos, indexar_clientes, filtro_por_defecto
+    )
+    from analitica import (
+        calcular_metricas, calcular_crecimiento,
+        agregar_por_segmento, agregar_temporal, agregar_top_asesores, clientes_unicos_por_año,
+        calcular_flujos, precalcular_series, pronosticar_series, calcular_concentracion, detectar_anomalias
+    )
+
+    _actualizar_estado(etapa='datos', inicio=time.time())
+    try:
+        version = version_datos()
+        df = cargar_datos(version)
+        if df is None:
+            raise RuntimeError("No se pudieron cargar los datos")
+
+        _actualizar_estado(etapa='dimensiones')
+        dimensiones = listar_dimensiones(df, version)
+
+        _actualizar_estado(etapa='índices')
+        indice = indexar_datos(df, version)
+        indexar_clientes(indice, version)
+
+        # Mismo filtro que el sidebar al abrir una sesión
+        _actualizar_estado(etapa='agregados')
+        filtro = filtro_por_defecto(dimensiones)
+        for agregado in (
+            calcular_metricas, calcular_crecimiento, agregar_por_segmento,
+            agregar_temporal, agregar_top_asesores, clientes_unicos_por_año
+        ):
+            agregado(indice, version, filtro)
+
+        _actualizar_estado(etapa='series')
+        precalcular_series(indice, version)
+        pronosticar_series(indice, version, 'Segmento Mesa')
+        calcular_flujos(indice, 'Asesor Comercial')
+        calcular_concentracion(indice, 'Asesor Comercial', indice['fechas'][-1], indice['firmas'][-1])
+        detectar_anomalias(indice, 'Asesor Comercial', range(len(indice['fechas']) - 3, len(indice['fechas'])))
+
+        with _candado:
+            _estado.update(listo=True, etapa='listo', duracion_s=time.time() - _estado['inicio'])
+    except Exception as e:
+        _actualizar_estado(etapa='error', error=str(e))
+
+def iniciar_precalentamiento():
+    """Inicia el precalentamiento en un hilo de fondo (una sola vez por proceso)"""
+    global _hilo
+    with _candado:
+        if _hilo is not None:
+            return
+        _hilo = threading.Thread(target=_precalentar, name='precalentamiento', daemon=True)
+        _hilo.start()
+
+# ==================== ENDPOINT DE SALUD ====================
+class _ManejadorSalud(BaseHTTPRequestHandler):
+    """GET /salud: 200 cuando los datos están listos, 503 mientras se precalientan"""
+
+    def do_GET(self):
+        if self.path.rstrip('/') != '/salud':
+            self.send_error(404)
+            return
+        estado = estado_precalentamiento()
+        cuerpo = json.dumps(estado).encode('utf-8')
+        self.send_response(200 if estado['listo'] else 503)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+def iniciar_servidor_salud(puerto=PUERTO_SALUD):
+    """Sirve el endpoint de salud en un hilo de fondo"""
+    servidor = ThreadingHTTPServer(('0.0.0.0', puerto), _ManejadorSalud)
+    threading.Thread(target=servidor.serve_forever, name='salud', daemon=True).start()
+    return servidor
+
+# ==================== EJECUTAR SERVIDOR ====================
+def main():
+    """Arranca salud y precalentamiento, luego Streamlit en el mismo proceso"""
+    from streamlit.web import cli as stcli
+
+    # Dashboard.py importa `servidor`: debe ver este mismo módulo y su estado
+    sys.modules.setdefault('servidor', sys.modules[__name__])
+    iniciar_servidor_salud()
+    iniciar_precalentamiento()
+    print(f"🩺 Endpoint de salud en http://localhost:{PUERTO_SALUD}/salud")
+
+    # Mismo proceso que Streamlit: el precalentamiento llena las cachés que usan las sesiones
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    sys.argv = ['streamlit', 'run', os.path.join(directorio, 'Dashboard.py')] + sys.argv[1:]
+    sys.exit(stcli.main())
+
+if __name__ == "__main__":
+    main()
@@ -130,6 +130,39 @@ def verificar_estructura_datos():
         print(f"   Error: {str(e)}")
         return False
 
+def verificar_calidad_datos():
+    """Valida todas las filas del libro con las reglas de calidad de la carga"""
+    print("\n Verificando calidad de los datos...")
+    
+    try:
+        import time
+        import pandas as pd
+        from datos import ARCHIVO_EXCEL, leer_excel, validar_calidad
+        
+        inicio = time.perf_counter()
+        hojas, motor = leer_excel(ARCHIVO_EXCEL)
+        df_test = pd.concat(hojas, ignore_index=True)
+        segundos_lectura = time.perf_counter() - inicio
+        calidad, _ = validar_calidad(df_test)
+        
+        print(f"   {len(df_test):,} registros leídos con {motor} en {segundos_lectura:.2f} s")
+        print(f"   Validación: {calidad['validacion_s']:.2f} s "
+              f"({calidad['validacion_s'] / segundos_lectura:.1%} de la lectura)")
+        
+        incumplidas = {regla: r for regla, r in calidad['reglas'].items() if r['filas']}
+        for regla, r in incumplidas.items():
+            print(f"   {regla}: {r['filas']:,} filas (p. ej. {r['ejemplos'][0]})")
+        
+        if incumplidas:
+            return False
+        else:
+            print("   Sin problemas de calidad")
+            return True
+            
+    except Exception as e:
+        print(f"   Error: {str(e)}")
+        return False
+
 def crear_screenshots_dir():
     """Crea directorio para screenshots si no existe"""
     print("\n Verificando directorio de screenshots...")
@@ -158,6 +191,7 @@ def main():
         verificar_dependencias(),
         verificar_datos(),
         verificar_estructura_datos(),
+        verificar_calidad_datos(),
         crear_screenshots_dir()
     ]
     
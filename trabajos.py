@@ -0,0 +1,64 @@
+"""
+Trabajos en segundo plano del Dashboard
+Autor: Enrique Alvarino
+Descripción: Registro de trabajos sobre un pool de hilos compartido por todas las sesiones,
+con estado consultable y retención acotada de resultados (ingesta de archivos y reportes PDF)
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class RegistroTrabajos:
+    """Pool de hilos con el estado y el resultado de cada trabajo, identificado por una clave de contenido"""
+
+    def __init__(self, nombre, max_trabajadores, max_retenidos):
+        # El pool es compartido por todas las sesiones: un trabajo no bloquea a otros usuarios
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_trabajadores, thread_name_prefix=nombre)
+        self._trabajos = OrderedDict()
+        self._candado = threading.Lock()
+        self.max_retenidos = max_retenidos
+
+    def estado(self, clave):
+        """Copia del estado de un trabajo (sin el resultado), o None si no existe"""
+        with self._candado:
+            trabajo = self._trabajos.get(clave)
+            return None if trabajo is None else {k: v for k, v in trabajo.items() if k != 'resultado'}
+
+    def resultado(self, clave):
+        """Resultado de un trabajo terminado, o None"""
+        with self._candado:
+            trabajo = self._trabajos.get(clave)
+            return None if trabajo is None else trabajo['resultado']
+
+    def actualizar(self, clave, **cambios):
+        """Actualiza etapa, progreso u otros datos de un trabajo en curso"""
+        with self._candado:
+            if clave in self._trabajos:
+                self._trabajos[clave].update(cambios)
+
+    def iniciar(self, clave, funcion, *args, **datos):
+        """Encola funcion(clave, *args); una misma clave se procesa una sola vez, salvo que haya fallado"""
+        with self._candado:
+            if clave in self._trabajos and not self._trabajos[clave]['error']:
+                self._trabajos.move_to_end(clave)
+                return clave
+            self._trabajos[clave] = {
+                **datos, 'etapa': 'en cola', 'progreso': 0.0,
+                'error': None, 'listo': False, 'resultado': None
+            }
+            self._trabajos.move_to_end(clave)
+            # Solo se liberan trabajos terminados, empezando por los más antiguos
+            terminados = [c for c, t in self._trabajos.items() if t['listo'] or t['error']]
+            for antiguo in terminados[:max(0, len(self._trabajos) - self.max_retenidos)]:
+                del self._trabajos[antiguo]
+        self._ejecutor.submit(self._ejecutar, clave, funcion, *args)
+        return clave
+
+    def _ejecutar(self, clave, funcion, *args):
+        try:
+            resultado = funcion(clave, *args)
+        except Exception as e:
+            self.actualizar(clave, error=str(e), etapa='error')
+        else:
+            self.actualizar(clave, resultado=resultado, listo=True, progreso=1.0, etapa='listo')